@@ -0,0 +1,177 @@
+import re
+from itertools import islice
+
+# Style flags.
+BOLD = 1
+DIM = 2
+ITALIC = 4
+UNDERLINE = 8
+INVERSE = 16
+STRIKE = 32
+
+# A style is (foreground, background, flags). A color is None for the
+# default, 0-255 for the xterm palette, or an (r, g, b) tuple.
+PLAIN = (None, None, 0)
+
+# An unfinished sequence longer than this is given up on and shown.
+MAX_PENDING = 4096
+# Style changes remembered as (style, parameters) -> style.
+TRANSITION_CACHE_SIZE = 4096
+
+# An escape sequence, less its ESC: CSI (with its parameters and final
+# byte as groups), OSC up to BEL or the next ESC, or a two-byte escape.
+_BODY = re.compile(r"\[([0-?]*)[ -/]*([@-~])|\][^\x07\x1b]*\x07?|[ -/]*[0-Z\\^-~]")
+# What a sequence cut off at the end of a chunk can look like.
+_PARTIAL = re.compile(r"\[[0-?]*[ -/]*|\][^\x07\x1b]*|[ -/]*")
+_SEQUENCE = re.compile("\x1b(?:" + _BODY.pattern + ")")
+
+_SET = {1: BOLD, 2: DIM, 3: ITALIC, 4: UNDERLINE, 7: INVERSE, 9: STRIKE, 21: UNDERLINE}
+_CLEAR = {22: BOLD | DIM, 23: ITALIC, 24: UNDERLINE, 27: INVERSE, 29: STRIKE}
+_CUBE = (0, 95, 135, 175, 215, 255)
+
+def strip_escapes(text):
+    return _SEQUENCE.sub("", text)
+
+class SgrParser:
+    """Splits output into (text, style) runs by its SGR escape sequences.
+
+    Output is fed a chunk at a time, and a sequence cut off at the end of
+    a chunk is held back until the next one. Colors and attributes carry
+    over between chunks, as they do in a terminal. Other escape
+    sequences (cursor movement, titles, ...) are dropped.
+    """
+
+    def __init__(self):
+        self.style = PLAIN
+        self.pending = ""
+        # Output repeats a handful of sequences, so each is parsed once.
+        self.transitions = {}
+
+    def reset(self):
+        self.style = PLAIN
+        self.pending = ""
+
+    def feed(self, text):
+        if self.pending:
+            text = self.pending + text
+            self.pending = ""
+        if "\x1b" not in text:
+            return [(text, self.style)] if text else []
+        pieces = text.split("\x1b")
+        if len(pieces[-1]) < MAX_PENDING and _PARTIAL.fullmatch(pieces[-1]):
+            self.pending = "\x1b" + pieces.pop()
+        style = self.style
+        transitions = self.transitions
+        runs = [(pieces[0], style)] if pieces[0] else []
+        add = runs.append
+        for piece in islice(pieces, 1, None):
+            # Each piece starts with a sequence; most are a plain SGR.
+            end = piece.find("m", 1, 64) if piece[:1] == "[" else -1
+            params = piece[1:end] if end > 0 else None
+            if params is not None and not params.strip("0123456789;:"):
+                changed = transitions.get((style, params))
+                style = self._transition(style, params) if changed is None else changed
+                rest = piece[end + 1:]
+            else:
+                match = _BODY.match(piece)
+                if match is None:
+                    # An escape that starts no sequence we know.
+                    rest = piece
+                else:
+                    params, final = match.groups()
+                    if final == "m":
+                        style = self._transition(style, params)
+                    rest = piece[match.end():]
+            if rest:
+                add((rest, style))
+        self.style = style
+        return runs
+
+    def _transition(self, style, params):
+        key = (style, params)
+        changed = self.transitions.get(key)
+        if changed is None:
+            if len(self.transitions) >= TRANSITION_CACHE_SIZE:
+                self.transitions.clear()
+            changed = self.transitions[key] = apply_sgr(style, params)
+        return changed
+
+def _number(text):
+    return int(text) if text.isdigit() else 0
+
+def _color(values):
+    """Color from the values after 38/48: `5;n` or `2;r;g;b`. Returns
+    (color, values used); the color is None if the values are invalid."""
+    if values[:1] == ["5"] and len(values) > 1:
+        index = _number(values[1])
+        return (index if index < 256 else None), 2
+    if values[:1] == ["2"] and len(values) > 3:
+        return tuple(min(255, _number(value)) for value in values[1:4]), 4
+    return None, len(values)
+
+def apply_sgr(style, params):
+    """`style` changed by the parameters of one `ESC [ ... m`."""
+    if params[:1] in ("<", "=", ">", "?"):
+        # Private sequences, such as xterm's key modifier options.
+        return style
+    foreground, background, flags = style
+    codes = params.split(";") if params else ["0"]
+    idx = 0
+    while idx < len(codes):
+        code = codes[idx]
+        idx += 1
+        if ":" in code:
+            # ISO 8613-6 form, e.g. 38:2::r:g:b or 4:3 for curly underline.
+            parts = code.split(":")
+            if parts[0] in ("38", "48"):
+                values = parts[1:]
+                if values[:1] == ["2"] and len(values) > 4:
+                    # Skip the color space id.
+                    values = values[:1] + values[2:]
+                color = _color(values)[0]
+                if parts[0] == "38":
+                    foreground = color
+                else:
+                    background = color
+            elif parts[0] == "4":
+                flags = flags | UNDERLINE if _number(parts[1]) else flags & ~UNDERLINE
+            continue
+        number = _number(code)
+        if number == 0:
+            foreground, background, flags = PLAIN
+        elif number in _SET:
+            flags |= _SET[number]
+        elif number in _CLEAR:
+            flags &= ~_CLEAR[number]
+        elif 30 <= number <= 37:
+            foreground = number - 30
+        elif 90 <= number <= 97:
+            foreground = number - 82
+        elif 40 <= number <= 47:
+            background = number - 40
+        elif 100 <= number <= 107:
+            background = number - 92
+        elif number == 39:
+            foreground = None
+        elif number == 49:
+            background = None
+        elif number in (38, 48):
+            color, used = _color(codes[idx:])
+            idx += used
+            if number == 38:
+                foreground = color
+            else:
+                background = color
+    return (foreground, background, flags)
+
+def color_name(color, palette):
+    """The "#rrggbb" name of a style's color; `palette` has the first 16."""
+    if isinstance(color, tuple):
+        return "#%02x%02x%02x" % color
+    if color < 16:
+        return palette[color]
+    if color < 232:
+        color -= 16
+        return "#%02x%02x%02x" % (_CUBE[color // 36], _CUBE[color // 6 % 6], _CUBE[color % 6])
+    level = 8 + (color - 232) * 10
+    return "#%02x%02x%02x" % (level, level, level)
@@ -1,51 +1,208 @@
-import queue
+from array import array
+from collections import deque
+from itertools import islice
 
-class TrieNode:
-    def __init__(self, letter, word, is_word=False):
-        self.word = word
-        self.is_word = is_word
-        self.letter = letter
-        self.next_nodes = {}
+class CompactTrie:
+    """Trie stored as flat parallel arrays (first-child / next-sibling layout).
+
+    Node 0 is the root. Words live once in the shared `words` string table and
+    a terminal node only keeps the index of its word in `word_ids`.
+    """
+    __slots__ = ("words", "size", "labels", "first_child", "next_sibling", "word_ids")
+
+    def __init__(self):
+        self.words = []
+        self.size = 0
+        self.labels = array("I", [0])
+        self.first_child = array("i", [-1])
+        self.next_sibling = array("i", [-1])
+        self.word_ids = array("i", [-1])
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, word):
+        node = self.find(word)
+        return node >= 0 and self.word_ids[node] >= 0
+
+    def _new_node(self, label):
+        self.labels.append(label)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.word_ids.append(-1)
+        return len(self.labels) - 1
+
+    def _mark_word(self, node, word):
+        if self.word_ids[node] < 0:
+            self.word_ids[node] = len(self.words)
+            self.words.append(word)
+            self.size += 1
+
+    def child(self, node, ch):
+        label = ord(ch)
+        child = self.first_child[node]
+        labels = self.labels
+        next_sibling = self.next_sibling
+        while child >= 0:
+            if labels[child] == label:
+                return child
+            if labels[child] > label:
+                return -1
+            child = next_sibling[child]
+        return -1
+
+    def find(self, prefix):
+        node = 0
+        for ch in prefix:
+            node = self.child(node, ch)
+            if node < 0:
+                return -1
+        return node
+
+    def insert(self, word):
+        node = 0
+        for ch in word:
+            label = ord(ch)
+            prev = -1
+            child = self.first_child[node]
+            while child >= 0 and self.labels[child] < label:
+                prev = child
+                child = self.next_sibling[child]
+            if child < 0 or self.labels[child] != label:
+                new_child = self._new_node(label)
+                self.next_sibling[new_child] = child
+                if prev < 0:
+                    self.first_child[node] = new_child
+                else:
+                    self.next_sibling[prev] = new_child
+                child = new_child
+            node = child
+        self._mark_word(node, word)
+
+    def remove(self, word):
+        """Remove `word`, unlinking any branch left without words. Returns
+        False if it was not in the trie."""
+        path = [0]
+        node = 0
+        for ch in word:
+            node = self.child(node, ch)
+            if node < 0:
+                return False
+            path.append(node)
+        word_id = self.word_ids[node]
+        if word_id < 0:
+            return False
+        self.word_ids[node] = -1
+        self.words[word_id] = None
+        self.size -= 1
+        while len(path) > 1:
+            node = path.pop()
+            if self.first_child[node] >= 0 or self.word_ids[node] >= 0:
+                break
+            self._unlink(path[-1], node)
+        return True
+
+    def _unlink(self, parent, node):
+        child = self.first_child[parent]
+        if child == node:
+            self.first_child[parent] = self.next_sibling[node]
+            return
+        while self.next_sibling[child] != node:
+            child = self.next_sibling[child]
+        self.next_sibling[child] = self.next_sibling[node]
 
 def compile_trie(commands):
-    start_trie = TrieNode("", "")
-    for command in commands:
-        curr_trie_node = start_trie
-        for ch in command:
-            if ch in curr_trie_node.next_nodes:
-                curr_trie_node = curr_trie_node.next_nodes[ch]
+    # Sorted input lets every new node be appended as the last child of its
+    # parent, so the build never scans sibling lists.
+    trie = CompactTrie()
+    path = [0]
+    prev = ""
+    for command in sorted(set(commands)):
+        common = 0
+        shared = min(len(prev), len(command))
+        while common < shared and prev[common] == command[common]:
+            common += 1
+        last_child = path[common + 1] if len(path) > common + 1 else -1
+        del path[common + 1:]
+        node = path[-1]
+        for ch in command[common:]:
+            new_node = trie._new_node(ord(ch))
+            if last_child >= 0:
+                trie.next_sibling[last_child] = new_node
             else:
-                next_trie_node = TrieNode(ch, curr_trie_node.word + ch)
-                curr_trie_node.next_nodes[ch] = next_trie_node
-                curr_trie_node = next_trie_node
-        curr_trie_node.is_word = True
-    return start_trie
+                trie.first_child[node] = new_node
+            last_child = -1
+            node = new_node
+            path.append(node)
+        trie._mark_word(node, command)
+        prev = command
+    return trie
 
 class Suffix:
+    __slots__ = ("word", "has_words")
+
     def __init__(self, suffix, has_words):
         self.word = suffix
         self.has_words = has_words
 
-def autocomplete(prefix, trie_node):
+def iter_completions(prefix, trie, order="bfs"):
+    """Lazily yield a Suffix for every word starting with `prefix`.
+
+    "bfs" yields shortest completions first (alphabetical within a length),
+    "sorted" yields them in plain lexicographic order. Callers can stop
+    consuming at any point without the rest of the subtree being visited.
+    """
+    if order not in ("bfs", "sorted"):
+        raise ValueError(f"unknown completion order: {order}")
     prefix = "".join([ch for ch in prefix if ord(ch) > 33])
-    curr_trienode = trie_node
-    for ch in prefix:
-        if ch in curr_trienode.next_nodes:
-            curr_trienode = curr_trienode.next_nodes[ch]
-        else:
-            return []
-    q = queue.Queue()
-    q.put(curr_trienode)
-    nodes = []
-    while q.qsize() > 0:
-        curr_node = q.get()
-        if curr_node.is_word:
-            nodes.append(curr_node)
-        for k, val in curr_node.next_nodes.items():
-            q.put(val)
-    return [
-        Suffix(node.word[len(prefix):], len(node.next_nodes) > 0) for node in nodes
-    ]
+    node = trie.find(prefix)
+    if node < 0:
+        return
+    first_child = trie.first_child
+    next_sibling = trie.next_sibling
+    word_ids = trie.word_ids
+    words = trie.words
+    skip = len(prefix)
+    if order == "bfs":
+        pending = deque([node])
+        pop = pending.popleft
+    else:
+        pending = [node]
+        pop = pending.pop
+    while pending:
+        curr_node = pop()
+        if order == "sorted" and curr_node != node and next_sibling[curr_node] >= 0:
+            pending.append(next_sibling[curr_node])
+        word_id = word_ids[curr_node]
+        if word_id >= 0:
+            yield Suffix(words[word_id][skip:], first_child[curr_node] >= 0)
+        child = first_child[curr_node]
+        if order == "sorted":
+            if child >= 0:
+                pending.append(child)
+            continue
+        while child >= 0:
+            pending.append(child)
+            child = next_sibling[child]
+
+def autocomplete(prefix, trie, limit=None, order="bfs"):
+    """Return completions of `prefix` as a list, at most `limit` of them."""
+    return list(islice(iter_completions(prefix, trie, order), limit))
+
+def common_extension(prefix, trie):
+    """The text that every word starting with `prefix` continues with, or
+    None if there is no such word. Only the shared path is walked."""
+    node = trie.find(prefix)
+    if node < 0:
+        return None
+    chars = []
+    while trie.word_ids[node] < 0:
+        child = trie.first_child[node]
+        if child < 0 or trie.next_sibling[child] >= 0:
+            break
+        chars.append(chr(trie.labels[child]))
+        node = child
+    return "".join(chars)
 
 def longest_common_prefix(strings):
     if not strings:
@@ -55,4 +212,4 @@ def longest_common_prefix(strings):
         char_set = set(s[i] for s in strings)
         if len(char_set) > 1:
             return strings[0][:i]
-    return strings[0][:min_len]
\ No newline at end of file
+    return strings[0][:min_len]
@@ -0,0 +1,100 @@
+"""Measure how fast colored process output is parsed and rendered.
+
+Generates compiler-style and `ls --color`-style output with SGR escape
+sequences, feeds it to SgrParser in READ_SIZE chunks, and prints MB/s as
+JSON. With PyQt5 installed, also times inserting the runs into a
+QTextDocument through AnsiFormats, offscreen, with ShellHighlighter
+attached as in the shell. Run with:
+
+    python benchmarks/bench_ansi.py [--megabytes 16]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ansi import SgrParser
+from process_runner import READ_SIZE
+
+def build_output(rng, size):
+    lines = []
+    total = 0
+    while total < size:
+        kind = rng.random()
+        idx = rng.randrange(100000)
+        if kind < 0.5:
+            line = f"[{idx:6d}] \x1b[32mCC\x1b[0m src/module_{idx % 400}.c"
+        elif kind < 0.6:
+            line = (f"\x1b[1msrc/module_{idx % 400}.c:{idx % 900}:12: \x1b[0m\x1b[1;35mwarning: \x1b[0m"
+                    f"unused variable '\x1b[1mtmp{idx}\x1b[0m' [\x1b[0;1;35m-Wunused-variable\x1b[0m]")
+        elif kind < 0.9:
+            line = "  ".join(f"\x1b[01;34mdir{idx + n}\x1b[0m" if n % 3 == 0 else f"\x1b[01;32mtool{idx + n}\x1b[0m"
+                             for n in range(6))
+        else:
+            line = f"plain progress line {idx} without any color"
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+def chunks(text):
+    return [text[idx:idx + READ_SIZE] for idx in range(0, len(text), READ_SIZE)]
+
+def bench_parser(parts, size):
+    best = None
+    for _ in range(3):
+        parser = SgrParser()
+        runs = 0
+        start = time.perf_counter()
+        for part in parts:
+            runs += len(parser.feed(part))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"bench": "parse", "megabytes": round(size / 1e6, 1), "runs": runs,
+            "mb_s": round(size / 1e6 / best, 1)}
+
+def bench_insert(parts, size):
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtGui import QTextCursor, QTextDocument
+    except ImportError:
+        return []
+    from shell_ui import AnsiFormats, ShellHighlighter
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    document = QTextDocument()
+    document.setMaximumBlockCount(10000)
+    highlighter = ShellHighlighter(document)
+    formats = AnsiFormats()
+    parser = SgrParser()
+    cursor = QTextCursor(document)
+    start = time.perf_counter()
+    for part in parts:
+        highlighter.skip_output = True
+        for text, style in parser.feed(part):
+            cursor.insertText(text, formats.get(style))
+        highlighter.skip_output = False
+    elapsed = time.perf_counter() - start
+    app.processEvents()
+    return [{"bench": "insert", "megabytes": round(size / 1e6, 1), "formats": len(formats.formats),
+             "mb_s": round(size / 1e6 / elapsed, 1)}]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=16)
+    args = parser.parse_args()
+
+    text = build_output(random.Random(4), int(args.megabytes * 1e6))
+    parts = chunks(text)
+    size = len(text.encode("utf-8"))
+    results = [bench_parser(parts, size)]
+    results += bench_insert(parts, size)
+    for result in results:
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Benchmark the shell core headlessly: PATH scan, trie, parser, dispatch.
+
+Builds synthetic PATH trees of each requested size in a temporary
+directory and prints one JSON document with timings and tracemalloc
+numbers, so runs on different commits can be diffed. Inputs come from
+fixed seeds. Run with:
+
+    python benchmarks/bench_core.py [--sizes 1000,10000,100000] [--output FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+import shell_core
+from autocomplete_trie import autocomplete, common_extension, compile_trie, longest_common_prefix
+from path_index import load_path_index, populate_path_map
+from bench_trie import synthetic_words
+
+PATH_DIRECTORIES = 16
+PREFIX_LENGTHS = [1, 2, 3, 4, 6, 8]
+PREFIXES_PER_LENGTH = 50
+SUGGESTION_LIMIT = shell_core.SUGGESTION_LIMIT
+
+class NullSink(shell_core.OutputSink):
+    def append(self, text):
+        pass
+
+    def write(self, text):
+        pass
+
+def timings(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min_ms": round(min(samples) * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+    }
+
+def traced(fn):
+    """Run `fn` under tracemalloc; returns (result, retained_kb, peak_kb).
+    Kept apart from timings(), which tracing would slow down."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current // 1024, peak // 1024
+
+def make_path_tree(root, names):
+    """Spread `names` as empty executables over PATH_DIRECTORIES folders."""
+    dirs = [os.path.join(root, f"bin{idx:02d}") for idx in range(PATH_DIRECTORIES)]
+    for directory in dirs:
+        os.mkdir(directory)
+    for idx, name in enumerate(names):
+        fd = os.open(os.path.join(dirs[idx % len(dirs)], name), os.O_WRONLY | os.O_CREAT, 0o755)
+        os.close(fd)
+    # Old enough that a cached listing is trusted (see RACY_MTIME_NS).
+    old = time.time_ns() - 3600 * 10**9
+    for directory in dirs:
+        os.utime(directory, ns=(old, old))
+    return dirs
+
+def bench_path_scan(size, dirs, cache_file, repeat):
+    os.environ["PATH"] = os.pathsep.join(dirs)
+    results = []
+    path_map, retained, peak = traced(populate_path_map)
+    assert len(path_map) == size, (len(path_map), size)
+    results.append({"bench": "populate_path_map", "executables": size,
+                    **timings(populate_path_map, repeat), "retained_kb": retained, "peak_kb": peak})
+
+    def cold():
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        return load_path_index(shell_core.builtins, cache_file)
+
+    def warm():
+        return load_path_index(shell_core.builtins, cache_file)
+
+    results.append({"bench": "load_path_index_cold", "executables": size, **timings(cold, repeat)})
+    warm()
+    _, retained, peak = traced(warm)
+    results.append({"bench": "load_path_index_cached", "executables": size,
+                    **timings(warm, repeat), "retained_kb": retained, "peak_kb": peak})
+    return results
+
+def sample_prefixes(names, length, rng):
+    candidates = [name for name in names if len(name) >= length]
+    return [name[:length] for name in rng.sample(candidates, min(PREFIXES_PER_LENGTH, len(candidates)))]
+
+def per_call_us(fn, args, rounds=3):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for arg in args:
+            fn(arg)
+        elapsed = (time.perf_counter() - start) / len(args)
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1e6, 2)
+
+def bench_trie(size, names, repeat):
+    results = []
+    words = names + shell_core.builtins
+    trie, retained, peak = traced(lambda: compile_trie(words))
+    results.append({"bench": "compile_trie", "executables": size,
+                    **timings(lambda: compile_trie(words), repeat), "retained_kb": retained, "peak_kb": peak})
+    rng = random.Random(2)
+    for length in PREFIX_LENGTHS:
+        prefixes = sample_prefixes(names, length, rng)
+        if not prefixes:
+            continue
+        completions = [[prefix + suffix.word for suffix in autocomplete(prefix, trie)] for prefix in prefixes]
+        results.append({
+            "bench": "autocomplete",
+            "executables": size,
+            "prefix_length": length,
+            "prefixes": len(prefixes),
+            "mean_matches": round(statistics.mean(len(matches) for matches in completions), 1),
+            "limited_us": per_call_us(lambda prefix: autocomplete(prefix, trie, SUGGESTION_LIMIT), prefixes),
+            "unlimited_us": per_call_us(lambda prefix: autocomplete(prefix, trie), prefixes),
+            "common_extension_us": per_call_us(lambda prefix: common_extension(prefix, trie), prefixes),
+            "longest_common_prefix_us": per_call_us(longest_common_prefix, completions),
+        })
+    return results
+
+def quoted_line(rng, words):
+    parts = []
+    while sum(len(part) + 1 for part in parts) < words * 8:
+        kind = rng.random()
+        word = "".join(rng.choice("abcdefghij klmno") for _ in range(rng.randint(3, 20)))
+        if kind < 0.3:
+            parts.append(f'"{word} $HOME ${{USER}}"')
+        elif kind < 0.5:
+            parts.append(f"'{word} $literal'")
+        elif kind < 0.6:
+            parts.append("$PATH")
+        else:
+            parts.append(word.replace(" ", "_"))
+    return "echo " + " ".join(parts) + " > out.txt 2>&1"
+
+def bench_parser(repeat):
+    rng = random.Random(3)
+    results = []
+    for words in (10, 100, 1000):
+        lines = [quoted_line(rng, words) for _ in range(max(1, 2000 // words))]
+        size = sum(len(line) for line in lines)
+        tokens = [shell_core.parse_arguments(line) for line in lines]
+
+        def parse_all():
+            for line in lines:
+                shell_core.parse_arguments(line)
+
+        def pipes_all():
+            for line_tokens in tokens:
+                shell_core.parse_pipes(line_tokens)
+
+        parse = timings(parse_all, repeat)
+        pipes = timings(pipes_all, repeat)
+        results.append({
+            "bench": "parser",
+            "words_per_line": words,
+            "lines": len(lines),
+            "parse_arguments_mb_s": round(size / 1e6 / (parse["min_ms"] / 1000), 2),
+            "parse_pipes_lines_s": round(len(lines) / (pipes["min_ms"] / 1000)),
+        })
+    return results
+
+def bench_dispatch(calls):
+    sink = NullSink()
+    results = []
+    shell_core.env_vars["X"] = "value"
+    for command in ["echo hi", "pwd", "set Y 1", "echo \"$X\" $X 'a b' c d e f", "type echo"]:
+        results.append({
+            "bench": "dispatch",
+            "command": command,
+            "us_per_call": per_call_us(lambda _: shell_core.dispatch(command, sink), range(calls)),
+        })
+    return results
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        return out.stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated PATH sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=2000, help="calls per dispatched command")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    metrics.enable(False)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": [],
+    }
+    saved_path = os.environ.get("PATH", "")
+    saved_cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="shell-bench-")
+    try:
+        # "." is always searched too; make it a folder without executables.
+        os.chdir(root)
+        for size in (int(value) for value in args.sizes.split(",")):
+            names = synthetic_words(size)
+            tree = os.path.join(root, f"path{size}")
+            os.mkdir(tree)
+            dirs = make_path_tree(tree, names)
+            report["results"] += bench_path_scan(size, dirs, os.path.join(root, f"cache{size}"), args.repeat)
+            report["results"] += bench_trie(size, names, args.repeat)
+            shutil.rmtree(tree)
+        os.environ["PATH"] = saved_path
+        report["results"] += bench_parser(args.repeat)
+        report["results"] += bench_dispatch(args.calls)
+    finally:
+        os.environ["PATH"] = saved_path
+        os.chdir(saved_cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
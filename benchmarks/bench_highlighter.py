@@ -0,0 +1,100 @@
+"""Time ShellHighlighter over a large output buffer, before and after.
+
+Fills a QTextDocument with prompt lines and process output, then measures
+a full rehighlight() and appending one more chunk of output. Needs PyQt5;
+runs offscreen. Run with:
+
+    python benchmarks/bench_highlighter.py [--lines N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QRegExp
+from PyQt5.QtGui import QColor, QGuiApplication, QSyntaxHighlighter, QTextCharFormat, QTextCursor, QTextDocument
+
+from shell_ui import ShellHighlighter
+
+
+class LegacyShellHighlighter(QSyntaxHighlighter):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.highlighting_rules = []
+
+        command_format = QTextCharFormat()
+        command_format.setForeground(QColor("#569cd6"))
+        keywords = ["exit", "echo", "pwd", "cd", "type", "clear"]
+        self.highlighting_rules.append((r'\b(' + '|'.join(keywords) + r')\b', command_format))
+
+        path_format = QTextCharFormat()
+        path_format.setForeground(QColor("#ce9178"))
+        self.highlighting_rules.append((r'[\'"]?([\/\.~][^\s\'"]*)[\'"]?', path_format))
+
+        string_format = QTextCharFormat()
+        string_format.setForeground(QColor("#ce9178"))
+        self.highlighting_rules.append((r'"[^"]*"|\'[^\']*\'', string_format))
+
+        error_format = QTextCharFormat()
+        error_format.setForeground(QColor("#ff5555"))
+        self.highlighting_rules.append((r'Error:.*', error_format))
+
+    def highlightBlock(self, text):
+        for pattern, format in self.highlighting_rules:
+            expression = QRegExp(pattern)
+            index = expression.indexIn(text)
+            while index >= 0:
+                length = expression.matchedLength()
+                self.setFormat(index, length, format)
+                index = expression.indexIn(text, index + length)
+
+def sample_text(lines):
+    out = []
+    for i in range(lines):
+        if i % 50 == 0:
+            out.append(f"$ echo 'step {i}' > ./logs/step.txt")
+        elif i % 97 == 0:
+            out.append(f"Error: step {i} failed in /usr/lib/libfoo.so")
+        else:
+            out.append(f"[{i:6d}] compiling src/module_{i % 400}.c -> build/obj/module_{i % 400}.o ok")
+    return "\n".join(out)
+
+def run(highlighter_cls, text, append_lines):
+    document = QTextDocument()
+    document.setPlainText(text)
+    highlighter = highlighter_cls(document)
+    start = time.perf_counter()
+    highlighter.rehighlight()
+    full_s = time.perf_counter() - start
+
+    chunk = "\n" + sample_text(append_lines)
+    cursor = QTextCursor(document)
+    cursor.movePosition(QTextCursor.End)
+    start = time.perf_counter()
+    cursor.insertText(chunk)
+    append_s = time.perf_counter() - start
+    return {
+        "highlighter": highlighter_cls.__name__,
+        "blocks": document.blockCount(),
+        "rehighlight_ms": round(full_s * 1000, 1),
+        "append_ms": round(append_s * 1000, 2),
+        "append_lines": append_lines,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--append", type=int, default=200)
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+    text = sample_text(args.lines)
+    for highlighter_cls in (LegacyShellHighlighter, ShellHighlighter):
+        print(json.dumps(run(highlighter_cls, text, args.append)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark the shell server: commands per second with N clients.
+
+Starts `main.py --serve` on a temporary socket, connects N clients at
+once, and has each run the same command back to back on its own session
+for a fixed time. Prints one JSON document. Run with:
+
+    python benchmarks/bench_server.py [--clients 1,4,16,64] [--seconds 3] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Builtins run on a worker thread of the server without a process; `true` starts one.
+COMMANDS = ["echo hello", "pwd", "true"]
+
+async def client(path, command, deadline, latencies):
+    reader, writer = await asyncio.open_unix_connection(path)
+    request_id = 0
+    try:
+        while time.perf_counter() < deadline:
+            request_id += 1
+            start = time.perf_counter()
+            writer.write((json.dumps({"id": request_id, "command": command}) + "\n").encode())
+            while True:
+                frame = json.loads(await reader.readline())
+                if frame.get("id") == request_id and ("exit" in frame or "error" in frame):
+                    break
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def measure(path, command, clients, seconds):
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(client(path, command, deadline, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "bench": "server",
+        "command": command,
+        "clients": clients,
+        "commands": len(latencies),
+        "commands_per_s": round(len(latencies) / elapsed, 1),
+        "median_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+    }
+
+def start_server(path):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py"), "--serve", path], cwd=ROOT)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError("shell server did not start")
+        time.sleep(0.05)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", default="1,4,16,64", help="comma-separated client counts (default: %(default)s)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="run time per measurement")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="shell-bench-") as root:
+        path = os.path.join(root, "server.sock")
+        server = start_server(path)
+        try:
+            for command in COMMANDS:
+                for clients in (int(value) for value in args.clients.split(",")):
+                    report["results"].append(asyncio.run(measure(path, command, clients, args.seconds)))
+        finally:
+            server.terminate()
+            server.wait()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
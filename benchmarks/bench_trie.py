@@ -0,0 +1,147 @@
+"""Compare the compact trie against the original TrieNode implementation.
+
+Each implementation is built in a fresh interpreter so RSS numbers are not
+polluted by the other one. Run with:
+
+    python benchmarks/bench_trie.py [--words N] [--path]
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import string
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autocomplete_trie
+
+
+class TrieNode:
+    def __init__(self, letter, word, is_word=False):
+        self.word = word
+        self.is_word = is_word
+        self.letter = letter
+        self.next_nodes = {}
+
+def legacy_compile_trie(commands):
+    start_trie = TrieNode("", "")
+    for command in commands:
+        curr_trie_node = start_trie
+        for ch in command:
+            if ch in curr_trie_node.next_nodes:
+                curr_trie_node = curr_trie_node.next_nodes[ch]
+            else:
+                next_trie_node = TrieNode(ch, curr_trie_node.word + ch)
+                curr_trie_node.next_nodes[ch] = next_trie_node
+                curr_trie_node = next_trie_node
+        curr_trie_node.is_word = True
+    return start_trie
+
+def legacy_autocomplete(prefix, trie_node, limit=None):
+    prefix = "".join([ch for ch in prefix if ord(ch) > 33])
+    curr_trienode = trie_node
+    for ch in prefix:
+        if ch in curr_trienode.next_nodes:
+            curr_trienode = curr_trienode.next_nodes[ch]
+        else:
+            return []
+    q = queue.Queue()
+    q.put(curr_trienode)
+    nodes = []
+    while q.qsize() > 0:
+        curr_node = q.get()
+        if curr_node.is_word:
+            nodes.append(curr_node)
+        for k, val in curr_node.next_nodes.items():
+            q.put(val)
+    return [
+        autocomplete_trie.Suffix(node.word[len(prefix):], len(node.next_nodes) > 0) for node in nodes
+    ]
+
+IMPLEMENTATIONS = {
+    "legacy": (legacy_compile_trie, legacy_autocomplete),
+    "compact": (autocomplete_trie.compile_trie, autocomplete_trie.autocomplete),
+}
+
+def synthetic_words(count, seed=0):
+    rng = random.Random(seed)
+    stems = ["git", "gcc", "python", "x86_64-linux-gnu-", "llvm-", "clang", "perl", "ssh", "k", "z"]
+    alphabet = string.ascii_lowercase + string.digits + "-_."
+    words = set()
+    while len(words) < count:
+        stem = rng.choice(stems)
+        tail = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 14)))
+        words.add(stem + tail)
+    return sorted(words)
+
+def path_words():
+    names = set()
+    for path in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            names.update(os.listdir(path))
+        except OSError:
+            pass
+    return sorted(names)
+
+def current_rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_impl(name, words, limit):
+    compile_fn, autocomplete_fn = IMPLEMENTATIONS[name]
+    rss_before = current_rss_kb()
+    start = time.perf_counter()
+    trie = compile_fn(words)
+    build_s = time.perf_counter() - start
+    rss_after = current_rss_kb()
+
+    rng = random.Random(1)
+    sample = rng.sample(words, min(50, len(words)))
+    keystrokes = [w[:n] for w in sample for n in range(1, len(w) + 1)]
+    start = time.perf_counter()
+    for prefix in keystrokes:
+        autocomplete_fn(prefix, trie, limit)
+    query_s = time.perf_counter() - start
+    return {
+        "impl": name,
+        "words": len(words),
+        "build_ms": round(build_s * 1000, 2),
+        "rss_kb": rss_after - rss_before,
+        "keystrokes": len(keystrokes),
+        "limit": limit,
+        "query_us_per_keystroke": round(query_s / len(keystrokes) * 1e6, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=30000)
+    parser.add_argument("--path", action="store_true", help="use executables from $PATH")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--impl", choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    words = path_words() if args.path else synthetic_words(args.words)
+    if args.impl:
+        limit = args.limit if args.limit > 0 else None
+        print(json.dumps(run_impl(args.impl, words, limit)))
+        return
+
+    base = [sys.executable, os.path.abspath(__file__), "--words", str(args.words)]
+    if args.path:
+        base.append("--path")
+    runs = [("legacy", 0), ("compact", 0), ("compact", args.limit)]
+    for impl, limit in runs:
+        out = subprocess.run(base + ["--impl", impl, "--limit", str(limit)],
+                             stdout=subprocess.PIPE, check=True)
+        print(out.stdout.decode().strip())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import threading
+import time
+
+# A name that could not be found is searched for again after this long,
+# in case it was installed somewhere the PATH watcher does not see.
+NEGATIVE_TTL = 2.0
+
+class CommandHash:
+    """Remembers where commands were found, like bash's `hash`.
+
+    Names are looked up in `index` (the PATH index, which the watcher
+    keeps current) and then searched for on PATH. Hits are counted per
+    name, and misses are remembered for NEGATIVE_TTL seconds. Names that
+    contain a slash are never cached.
+    """
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else {}
+        self.paths = {}
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    def find(self, name):
+        """Where `name` would run from, without remembering it."""
+        if "/" in name:
+            return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+        with self._lock:
+            path = self.paths.get(name)
+            if path is not None:
+                return path
+            missed_at = self.misses.get(name)
+        if missed_at is not None and time.monotonic() - missed_at < NEGATIVE_TTL:
+            return None
+        path = self.index.get(name) or shutil.which(name)
+        if path is None:
+            with self._lock:
+                self.misses[name] = time.monotonic()
+        return path
+
+    def add(self, name):
+        """Remember where `name` is, as `hash name` does; returns the path."""
+        path = self.find(name)
+        if path is not None and "/" not in name:
+            with self._lock:
+                self.misses.pop(name, None)
+                self.paths[name] = path
+                self.hits.setdefault(name, 0)
+        return path
+
+    def resolve(self, name):
+        """Absolute path to run for `name`, or None; counts a hit."""
+        path = self.add(name)
+        if path is not None and "/" not in name:
+            with self._lock:
+                self.hits[name] = self.hits.get(name, 0) + 1
+        return path
+
+    def forget(self, name):
+        with self._lock:
+            self.paths.pop(name, None)
+            self.hits.pop(name, None)
+            self.misses.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self.paths.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def entries(self):
+        """(hits, name, path) for every remembered command, by name."""
+        with self._lock:
+            return [(self.hits.get(name, 0), name, path) for name, path in sorted(self.paths.items())]
@@ -0,0 +1,133 @@
+import json
+import math
+import os
+import threading
+import time
+
+RANKS_FILE = os.path.expanduser("~/.shell_history.ranks")
+# A use counts half as much after this many seconds.
+HALF_LIFE = 7 * 24 * 3600.0
+# Ranked completions kept for every prefix.
+TOP_K = 10
+# The lowest-scored commands are dropped beyond this many.
+MAX_COMMANDS = 5000
+# Scores are rebased before 2**REBASE_EXPONENT gets anywhere near overflow.
+REBASE_EXPONENT = 512
+
+class CommandRanks:
+    """Frecency scores for command names, and the best-scored commands
+    for every prefix.
+
+    A use at time t adds 2**((t - epoch) / HALF_LIFE) to a command's
+    score. That is the usual exponentially decayed count scaled by a
+    factor shared by all commands, so scores never have to be decayed
+    and their order only changes when a command is used. Each prefix
+    keeps its TOP_K commands sorted, which one use updates along the
+    command's own prefixes, and top() answers by one dict lookup.
+    """
+
+    def __init__(self, path=RANKS_FILE):
+        self.path = path
+        self.epoch = time.time()
+        self.scores = {}
+        self.top_by_prefix = {}
+        # save() does nothing before load(), so it never replaces the
+        # file with just this session's uses.
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            epoch = float(data["epoch"])
+            scores = {name: float(score) for name, score in data["scores"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.loaded = True
+            return
+        with self._lock:
+            # Uses made before the file was read are kept.
+            scale = 2.0 ** ((self.epoch - epoch) / HALF_LIFE)
+            for name, score in self.scores.items():
+                scores[name] = scores.get(name, 0.0) + score * scale
+            self.epoch = epoch
+            self.scores = scores
+            self._rebase()
+            self._rebuild()
+            self.loaded = True
+
+    def save(self):
+        if not self.loaded:
+            return
+        with self._lock:
+            data = {"epoch": self.epoch, "scores": self.scores}
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+    def use(self, name, now=None):
+        if not name or "/" in name:
+            return
+        weight = 2.0 ** (((time.time() if now is None else now) - self.epoch) / HALF_LIFE)
+        with self._lock:
+            score = self.scores.get(name, 0.0) + weight
+            self.scores[name] = score
+            if weight > 2.0 ** REBASE_EXPONENT:
+                self._rebase()
+                self._rebuild()
+                return
+            if len(self.scores) > MAX_COMMANDS:
+                self._prune()
+                return
+            # Scores only grow, so the entry can only move up, and no
+            # other command has to come back into any list.
+            for end in range(len(name) + 1):
+                self._place(name[:end], name, score)
+
+    def _place(self, prefix, name, score):
+        ranked = self.top_by_prefix.get(prefix)
+        if ranked is None:
+            ranked = self.top_by_prefix[prefix] = []
+        for idx, (_, other) in enumerate(ranked):
+            if other == name:
+                del ranked[idx]
+                break
+        idx = len(ranked)
+        while idx > 0 and ranked[idx - 1][0] < score:
+            idx -= 1
+        if idx < TOP_K:
+            ranked.insert(idx, (score, name))
+            del ranked[TOP_K:]
+
+    def _rebase(self):
+        if not self.scores:
+            return
+        largest = max(self.scores.values())
+        if largest <= 2.0 ** REBASE_EXPONENT:
+            return
+        shift = math.floor(math.log2(largest))
+        self.epoch += shift * HALF_LIFE
+        scale = 2.0 ** -shift
+        self.scores = {name: score * scale for name, score in self.scores.items() if score * scale > 0}
+
+    def _prune(self):
+        kept = sorted(self.scores.items(), key=lambda item: item[1], reverse=True)[:MAX_COMMANDS // 2]
+        self.scores = dict(kept)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.top_by_prefix = {}
+        for name, score in sorted(self.scores.items(), key=lambda item: item[1], reverse=True):
+            for end in range(len(name) + 1):
+                ranked = self.top_by_prefix.setdefault(name[:end], [])
+                if len(ranked) < TOP_K:
+                    ranked.append((score, name))
+
+    def top(self, prefix, limit=TOP_K):
+        """The best-scored commands starting with `prefix`, best first."""
+        with self._lock:
+            return [name for _, name in self.top_by_prefix.get(prefix, ())[:limit]]
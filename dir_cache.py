@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Listings of directories modified this recently are re-read on every use,
+# since a change within the same mtime tick would go unnoticed.
+RACY_MTIME_NS = 10**9
+
+class DirectoryListing:
+    __slots__ = ("names", "is_dir", "mtime_ns", "scanned_at")
+
+    def __init__(self, names, is_dir, mtime_ns, scanned_at):
+        self.names = names
+        self.is_dir = is_dir
+        self.mtime_ns = mtime_ns
+        self.scanned_at = scanned_at
+
+    def complete(self, partial):
+        """(name, is_dir) pairs for every entry starting with `partial`."""
+        names = self.names
+        start = bisect_left(names, partial)
+        end = start
+        while end < len(names) and names[end].startswith(partial):
+            end += 1
+        return [(names[i], bool(self.is_dir[i])) for i in range(start, end)]
+
+def scan_listing(path, mtime_ns):
+    scanned_at = time.time_ns()
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            entries.append((entry.name, is_dir))
+    entries.sort()
+    return DirectoryListing(
+        [name for name, _ in entries],
+        bytearray(is_dir for _, is_dir in entries),
+        mtime_ns,
+        scanned_at,
+    )
+
+class DirectoryCache:
+    """LRU cache of sorted directory listings, validated by directory mtime.
+
+    Listings can be prefetched on a background thread; a lookup that races
+    with a prefetch of the same directory waits for it instead of scanning
+    twice.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._listings = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1)
+
+    def _valid(self, listing, mtime_ns):
+        return (listing is not None and listing.mtime_ns == mtime_ns
+                and listing.scanned_at - mtime_ns > RACY_MTIME_NS)
+
+    def _load(self, path, mtime_ns):
+        try:
+            listing = scan_listing(path, mtime_ns)
+        except OSError:
+            with self._lock:
+                self._inflight.pop(path, None)
+            raise
+        with self._lock:
+            self._listings[path] = listing
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.max_entries:
+                self._listings.popitem(last=False)
+            self._inflight.pop(path, None)
+        return listing
+
+    def get(self, path):
+        """Sorted listing of `path`, or None if it cannot be read."""
+        path = os.path.abspath(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            listing = self._listings.get(path)
+            if self._valid(listing, mtime_ns):
+                self._listings.move_to_end(path)
+                return listing
+            future = self._inflight.get(path)
+        if future is not None:
+            try:
+                listing = future.result()
+            except OSError:
+                listing = None
+            if listing is not None and listing.mtime_ns == mtime_ns:
+                return listing
+        try:
+            return self._load(path, mtime_ns)
+        except OSError:
+            return None
+
+    def cached(self, path):
+        """The cached listing of `path` if it is still current, without scanning."""
+        path = os.path.abspath(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            listing = self._listings.get(path)
+        return listing if self._valid(listing, mtime_ns) else None
+
+    def prefetch(self, path):
+        """Build the listing of `path` in the background if it is not cached."""
+        path = os.path.abspath(path)
+        if self.cached(path) is not None:
+            return
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        with self._lock:
+            if path in self._inflight:
+                return
+            self._inflight[path] = self._worker.submit(self._load, path, mtime_ns)
+
+    def preview(self, path, count=3):
+        """First `count` names in `path` and whether there are more.
+
+        Uses the cached listing when there is one; otherwise reads only
+        count + 1 entries instead of listing the whole directory.
+        """
+        listing = self.cached(path)
+        if listing is not None:
+            return listing.names[:count], len(listing.names) > count
+        names = []
+        with os.scandir(path) as it:
+            for entry in it:
+                names.append(entry.name)
+                if len(names) > count:
+                    break
+        return names[:count], len(names) > count
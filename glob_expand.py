@@ -0,0 +1,215 @@
+import os
+import re
+from functools import lru_cache
+
+# More matches than this for one word is an error rather than an argument
+# list; `parallel ... ::: pattern` streams its items and has no limit.
+GLOB_LIMIT = 100000
+# A `**` walk lists a level's directories on this many threads once the
+# level is at least PARALLEL_WALK_THRESHOLD directories wide.
+WALK_WORKERS = 8
+PARALLEL_WALK_THRESHOLD = 32
+
+_SPECIAL = re.compile(r"[*?\[\\]")
+_ESCAPED = re.compile(r"\\(.)", re.DOTALL)
+
+def escape(text):
+    """`text` as a pattern that only matches itself (for quoted text)."""
+    return _SPECIAL.sub(r"\\\g<0>", text)
+
+def has_magic(segment):
+    idx = 0
+    while idx < len(segment):
+        ch = segment[idx]
+        if ch == "\\":
+            idx += 2
+            continue
+        if ch in "*?[":
+            return True
+        idx += 1
+    return False
+
+def unescape(segment):
+    return _ESCAPED.sub(r"\1", segment)
+
+@lru_cache(maxsize=256)
+def compile_segment(segment):
+    """Regex that fullmatches the names one path segment selects."""
+    out = []
+    idx = 0
+    length = len(segment)
+    while idx < length:
+        ch = segment[idx]
+        if ch == "\\" and idx + 1 < length:
+            out.append(re.escape(segment[idx + 1]))
+            idx += 2
+            continue
+        if ch == "*":
+            if not out or out[-1] != ".*":
+                out.append(".*")
+        elif ch == "?":
+            out.append(".")
+        elif ch == "[":
+            end = idx + 1
+            if end < length and segment[end] in "!^":
+                end += 1
+            if end < length and segment[end] == "]":
+                end += 1
+            end = segment.find("]", end)
+            if end >= 0:
+                bracket = _bracket(segment[idx + 1:end])
+                try:
+                    re.compile(bracket)
+                except re.error:
+                    # An invalid set such as `[z-a]` is taken literally, as in bash.
+                    end = -1
+            if end < 0:
+                out.append(re.escape(ch))
+            else:
+                out.append(bracket)
+                idx = end
+        else:
+            out.append(re.escape(ch))
+        idx += 1
+    return re.compile("".join(out), re.DOTALL)
+
+def _bracket(body):
+    negate = body[:1] in ("!", "^")
+    if negate:
+        body = body[1:]
+    out = []
+    idx = 0
+    while idx < len(body):
+        ch = body[idx]
+        if ch == "\\" and idx + 1 < len(body):
+            out.append(re.escape(body[idx + 1]))
+            idx += 2
+            continue
+        out.append(ch if ch == "-" else re.escape(ch))
+        idx += 1
+    return "[" + ("^" if negate else "") + "".join(out) + "]"
+
+class GlobExpander:
+    """Filename expansion for one command.
+
+    Patterns are split on `/`; leading segments without wildcards are
+    used as the starting directory, so only what can match is listed.
+    Listings are read with os.scandir and kept until the expander is
+    dropped, so a pipeline that globs the same directory twice lists it
+    once. `**` matches any number of directories, not entering hidden or
+    symlinked ones; names starting with `.` only match a pattern that
+    starts with `.` too.
+    """
+
+    def __init__(self, cwd=None):
+        self.cwd = cwd if cwd is not None else os.getcwd()
+        self.listings = {}
+
+    def _path(self, prefix):
+        return os.path.join(self.cwd, prefix) if prefix else self.cwd
+
+    def _list(self, prefix):
+        """Sorted (name, is_dir, is_link) for the directory `prefix`."""
+        path = self._path(prefix)
+        listing = self.listings.get(path)
+        if listing is None:
+            listing = []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            is_dir = entry.is_dir()
+                            is_link = is_dir and entry.is_symlink()
+                        except OSError:
+                            is_dir = is_link = False
+                        listing.append((entry.name, is_dir, is_link))
+            except OSError:
+                pass
+            listing.sort()
+            self.listings[path] = listing
+        return listing
+
+    def _walk(self, prefix):
+        """`prefix` and every directory below it, a level at a time."""
+        level = [prefix]
+        pool = None
+        try:
+            while level:
+                yield from level
+                if len(level) >= PARALLEL_WALK_THRESHOLD:
+                    if pool is None:
+                        from concurrent.futures import ThreadPoolExecutor
+                        pool = ThreadPoolExecutor(max_workers=WALK_WORKERS)
+                    listings = list(pool.map(self._list, level))
+                else:
+                    listings = [self._list(directory) for directory in level]
+                level = [directory + name + "/"
+                         for directory, listing in zip(level, listings)
+                         for name, is_dir, is_link in listing
+                         if is_dir and not is_link and not name.startswith(".")]
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+    def _match(self, prefix, segments):
+        segment, rest = segments[0], segments[1:]
+        if segment == "**":
+            for directory in self._walk(prefix):
+                if rest:
+                    yield from self._match(directory, rest)
+                    continue
+                for name, _, _ in self._list(directory):
+                    if not name.startswith("."):
+                        yield directory + name
+            return
+        if not has_magic(segment):
+            path = prefix + unescape(segment)
+            if rest:
+                yield from self._match(path + "/", rest)
+            elif path and os.path.lexists(self._path(path)):
+                yield path
+            return
+        pattern = compile_segment(segment)
+        hidden = segment.startswith(".")
+        for name, is_dir, _ in self._list(prefix):
+            if name.startswith(".") and not hidden:
+                continue
+            if pattern.fullmatch(name) is None:
+                continue
+            if rest:
+                if is_dir:
+                    yield from self._match(prefix + name + "/", rest)
+            else:
+                yield prefix + name
+
+    def iter_matches(self, pattern):
+        """Lazily yield the paths `pattern` matches, in the order found."""
+        segments = pattern.split("/")
+        prefix = ""
+        if pattern.startswith("/"):
+            prefix = "/"
+            segments = segments[1:]
+        # Wildcard-free leading segments select the starting directory.
+        while len(segments) > 1 and not has_magic(segments[0]):
+            prefix += unescape(segments.pop(0)) + "/"
+        return self._match(prefix, segments)
+
+    def stream(self, pattern, literal):
+        """Like iter_matches(), but yields `literal` if nothing matches."""
+        matched = False
+        for path in self.iter_matches(pattern):
+            matched = True
+            yield path
+        if not matched:
+            yield literal
+
+    def expand(self, pattern, limit=GLOB_LIMIT):
+        """Sorted matches of `pattern`. Raises ValueError with a message
+        past `limit` matches."""
+        matches = []
+        for path in self.iter_matches(pattern):
+            matches.append(path)
+            if len(matches) > limit:
+                raise ValueError(f"{unescape(pattern)}: argument list too long (over {limit} matches)")
+        matches.sort()
+        return matches
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import threading
+from array import array
+
+HISTORY_FILE = os.path.expanduser("~/.shell_history.log")
+HISTORY_LIMIT = 200000
+INDEX_BATCH = 5000
+FUZZY_SCAN_LIMIT = 20000
+
+class HistoryStore:
+    """Append-only command history with a trigram search index.
+
+    Every command is appended to a line-delimited JSON log as soon as it is
+    entered, so nothing is lost if the shell dies. The log is read on a
+    background thread, which then builds the trigram index in batches;
+    commands not indexed yet are simply scanned. Up/Down navigation sees
+    every entry (minus immediate repeats), while search works over distinct
+    commands ranked by how recently they were used.
+    """
+
+    def __init__(self, path=HISTORY_FILE, limit=HISTORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.entries = []
+        self.commands = []
+        self.lowered = []
+        self.command_ids = {}
+        self.last_used = array("q")
+        self.trigrams = {}
+        self.indexed = 0
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._pending = None
+        self._fd = None
+
+    def import_entries(self, commands):
+        """Seed a missing log, e.g. from the old JSON history file."""
+        if os.path.exists(self.path) or not commands:
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            for command in commands:
+                f.write(json.dumps(command) + "\n")
+
+    def start_loading(self):
+        threading.Thread(target=self._load, name="HistoryLoader", daemon=True).start()
+
+    def _load(self):
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            self._pending = []
+        commands = []
+        lines = []
+        if size:
+            with open(self.path, "rb") as f:
+                lines = f.read(size).splitlines()
+            for line in lines:
+                try:
+                    command = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(command, str):
+                    commands.append(command)
+        if len(commands) > self.limit:
+            commands = commands[-self.limit:]
+        with self._lock:
+            for command in commands + self._pending:
+                self._record(command)
+            self._pending = None
+            if len(lines) > 2 * self.limit:
+                self._compact()
+            self._loaded.set()
+        while True:
+            with self._lock:
+                end = min(self.indexed + INDEX_BATCH, len(self.commands))
+                for command_id in range(self.indexed, end):
+                    self._index(command_id)
+                self.indexed = end
+                if end == len(self.commands):
+                    return
+
+    def _compact(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for command in self.entries:
+                    f.write(json.dumps(command) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _record(self, command):
+        if not self.entries or self.entries[-1] != command:
+            self.entries.append(command)
+        seq = len(self.entries)
+        command_id = self.command_ids.get(command)
+        if command_id is not None:
+            self.last_used[command_id] = seq
+            return
+        self.command_ids[command] = len(self.commands)
+        self.commands.append(command)
+        lowered = command.lower()
+        self.lowered.append(command if lowered == command else lowered)
+        self.last_used.append(seq)
+
+    def _index(self, command_id):
+        lowered = self.lowered[command_id]
+        trigrams = self.trigrams
+        for trigram in {lowered[i:i + 3] for i in range(len(lowered) - 2)}:
+            postings = trigrams.get(trigram)
+            if postings is None:
+                postings = trigrams[trigram] = array("i")
+            postings.append(command_id)
+
+    def add(self, command):
+        if not command.strip():
+            return
+        line = (json.dumps(command) + "\n").encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            os.write(self._fd, line)
+            if self._pending is not None:
+                self._pending.append(command)
+            elif self._loaded.is_set():
+                self._record(command)
+                if self.indexed == len(self.commands) - 1:
+                    self._index(self.indexed)
+                    self.indexed += 1
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __len__(self):
+        self._loaded.wait()
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        self._loaded.wait()
+        return self.entries[index]
+
+    def _substring_candidates(self, query):
+        if len(query) < 3:
+            return range(len(self.commands))
+        best = None
+        for trigram in {query[i:i + 3] for i in range(len(query) - 2)}:
+            postings = self.trigrams.get(trigram, ())
+            if best is None or len(postings) < len(best):
+                best = postings
+        # Commands the background indexer has not reached are scanned.
+        return list(best) + list(range(self.indexed, len(self.commands)))
+
+    def search(self, query, limit=50):
+        """Commands containing `query` (case-insensitive), most recent first,
+        followed by fuzzy matches that contain its characters in order."""
+        self._loaded.wait()
+        query = query.lower()
+        with self._lock:
+            lowered = self.lowered
+            last_used = self.last_used
+            substring = [i for i in self._substring_candidates(query) if query in lowered[i]]
+            substring.sort(key=last_used.__getitem__, reverse=True)
+            results = substring[:limit]
+            if len(results) < limit and len(query) > 1:
+                pattern = re.compile(".*?".join(re.escape(ch) for ch in query))
+                seen = set(substring)
+                fuzzy = []
+                # Newer commands have higher ids; bound the scan for speed.
+                for i in range(len(self.commands) - 1, max(-1, len(self.commands) - 1 - FUZZY_SCAN_LIMIT), -1):
+                    if i in seen:
+                        continue
+                    match = pattern.search(lowered[i])
+                    if match is not None:
+                        fuzzy.append((match.end() - match.start(), -last_used[i], i))
+                fuzzy.sort()
+                results.extend(i for _, _, i in fuzzy[:limit - len(results)])
+            return [self.commands[i] for i in results]
@@ -0,0 +1,184 @@
+import signal
+import threading
+import time
+from functools import partial
+
+RUNNING = "Running"
+STOPPED = "Stopped"
+DONE = "Done"
+
+STOP_SIGNALS = [getattr(signal, name) for name in ("SIGSTOP", "SIGTSTP", "SIGTTIN", "SIGTTOU")
+                if hasattr(signal, name)]
+
+class Job:
+    """A started ProcessRunner or Pipeline and its entry in the job table."""
+
+    def __init__(self, job_id, runner, command, foreground):
+        self.id = job_id
+        self.runner = runner
+        self.command = command
+        self.foreground = foreground
+        self.state = RUNNING
+        self.returncode = None
+        self.started_at = time.perf_counter()
+        self.ended_at = None
+        # Set by the `time` builtin; reported once the job is waited for.
+        self.timing = None
+        # Background output after the last newline, held back until the
+        # line is complete so it can be tagged.
+        self.partial = ""
+
+    @property
+    def pid(self):
+        pids = self.runner.pids()
+        return pids[-1] if pids else None
+
+    def describe(self):
+        if self.state == DONE:
+            state = "Done" if self.returncode == 0 else f"Exit {self.returncode}"
+            return f"[{self.id}]  {state:<24}{self.command}"
+        return f"[{self.id}]  {self.state:<24}{self.command} &"
+
+class JobTable:
+    """Jobs started by the shell, numbered from 1 like %1, %2, ...
+
+    Runners reap their own children on waiter threads, so exits arrive as
+    callbacks and nothing here polls. `on_output(text)` gets foreground
+    output as is and background output in whole lines prefixed with the
+    job number. If `on_error` is set, it gets the stderr of foreground
+    jobs instead. `on_exit(job)` runs after a job's state is updated. All
+    are called from runner threads. Finished background jobs stay listed
+    until they are reported by pop_finished() or `jobs`.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.on_output = None
+        self.on_error = None
+        self.on_exit = None
+        self._changed = threading.Condition()
+
+    def start(self, runner, command, foreground):
+        with self._changed:
+            job = Job(max(self.jobs, default=0) + 1, runner, command, foreground)
+            self.jobs[job.id] = job
+        try:
+            runner.start(partial(self._output, job), partial(self._exited, job), partial(self._error, job))
+        except OSError:
+            with self._changed:
+                del self.jobs[job.id]
+            raise
+        return job
+
+    def _emit(self, text):
+        if text and self.on_output is not None:
+            self.on_output(text)
+
+    def _flush_partial(self, job):
+        if job.partial:
+            self._emit(f"[{job.id}] {job.partial}\n")
+            job.partial = ""
+
+    def _output(self, job, text):
+        # Held across on_output so chunks reach the sink in order.
+        with self._changed:
+            if job.foreground:
+                self._emit(text)
+                return
+            lines = (job.partial + text).split("\n")
+            job.partial = lines.pop()
+            self._emit("".join(f"[{job.id}] {line}\n" for line in lines))
+
+    def _error(self, job, text):
+        if self.on_error is None or not job.foreground:
+            self._output(job, text)
+            return
+        with self._changed:
+            if text:
+                self.on_error(text)
+
+    def _exited(self, job, returncode):
+        with self._changed:
+            self._flush_partial(job)
+            job.ended_at = time.perf_counter()
+            job.state = DONE
+            job.returncode = returncode
+            if job.foreground:
+                del self.jobs[job.id]
+            self._changed.notify_all()
+        if self.on_exit is not None:
+            self.on_exit(job)
+
+    def set_foreground(self, job):
+        """Move `job` to the foreground; False if it has already exited."""
+        with self._changed:
+            if job.state == DONE:
+                return False
+            self._flush_partial(job)
+            job.foreground = True
+            return True
+
+    def find(self, spec=None):
+        """The job for `%N`, `N`, `%+`, `%%` or `%prefix`; the most recent
+        one when `spec` is None."""
+        with self._changed:
+            jobs = [job for job in self.jobs.values() if not job.foreground]
+        if spec in (None, "%", "%+", "%%"):
+            return jobs[-1] if jobs else None
+        if spec == "%-":
+            return jobs[-2] if len(jobs) > 1 else None
+        name = spec[1:] if spec.startswith("%") else spec
+        if name.isdigit():
+            job = self.jobs.get(int(name))
+            return job if job is not None and not job.foreground else None
+        matches = [job for job in jobs if job.command.startswith(name)]
+        return matches[-1] if matches else None
+
+    def running(self):
+        with self._changed:
+            return [job for job in self.jobs.values() if job.state != DONE and not job.foreground]
+
+    def listing(self):
+        """Every background job; finished ones are dropped once listed."""
+        with self._changed:
+            jobs = [job for job in self.jobs.values() if not job.foreground]
+            for job in jobs:
+                if job.state == DONE:
+                    del self.jobs[job.id]
+        return jobs
+
+    def remove(self, job):
+        with self._changed:
+            self.jobs.pop(job.id, None)
+
+    def pop_finished(self):
+        with self._changed:
+            done = [job for job in self.jobs.values() if job.state == DONE]
+            for job in done:
+                del self.jobs[job.id]
+        return done
+
+    def wait(self, jobs):
+        """Block until every job in `jobs` has exited."""
+        with self._changed:
+            while any(job.state != DONE for job in jobs):
+                self._changed.wait()
+
+    def send_signal(self, job, sig):
+        job.runner.send_signal(sig)
+        if job.state == DONE:
+            return
+        if sig in STOP_SIGNALS:
+            job.state = STOPPED
+        elif sig == getattr(signal, "SIGCONT", None):
+            job.state = RUNNING
+
+    def resume(self, job):
+        if job.state == STOPPED:
+            self.send_signal(job, signal.SIGCONT)
+
+    def terminate_all(self):
+        with self._changed:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.runner.terminate()
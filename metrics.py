@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+# Latency histograms for the shell's hot paths. Off unless SHELL_METRICS
+# is set or `stats on` is run; while off, start() returns None and stop()
+# returns at once, so instrumented code pays one global lookup.
+enabled = bool(os.environ.get("SHELL_METRICS"))
+histograms = {}
+profiler = None
+_lock = threading.Lock()
+
+class Histogram:
+    """Counts of samples in power-of-two microsecond buckets: bucket i
+    holds samples below 2**i us."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * 32
+
+    def add(self, seconds):
+        micros = int(seconds * 1e6)
+        self.buckets[min(micros.bit_length(), 31)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.min = seconds if self.min is None else min(self.min, seconds)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        target = fraction * self.count
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min((1 << idx) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "min_ms": round((self.min or 0) * 1000, 3),
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p90_ms": round(self.percentile(0.9) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+def start():
+    return time.perf_counter() if enabled else None
+
+def stop(name, started):
+    """Record the time since `started`, a value returned by start()."""
+    if started is None:
+        return
+    record(name, time.perf_counter() - started)
+
+def record(name, seconds):
+    with _lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.add(seconds)
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+def reset():
+    with _lock:
+        histograms.clear()
+
+def snapshot():
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+
+def to_json():
+    import json
+    return json.dumps({"enabled": enabled, "histograms": snapshot()}, indent=2)
+
+def format_table():
+    rows = snapshot()
+    if not rows:
+        return "no samples\n" if enabled else "instrumentation is off; run `stats on`\n"
+    columns = ["count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    width = max(len(name) for name in rows)
+    lines = ["path".ljust(width) + "".join(f"{column:>10}" for column in columns)]
+    for name, row in rows.items():
+        lines.append(name.ljust(width) + "".join(f"{row[column]:>10}" for column in columns))
+    return "\n".join(lines) + "\n"
+
+def start_profile():
+    """Profile the calling thread (the GUI or script thread) with cProfile."""
+    global profiler
+    import cProfile
+    if profiler is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+def stop_profile(path=None):
+    """Stop profiling; dump the raw stats to `path` if given, and return
+    the top functions by cumulative time as text. The profiler is dropped
+    even if dumping raises OSError."""
+    global profiler
+    import io
+    import pstats
+    if profiler is None:
+        return ""
+    profiler.disable()
+    try:
+        if path:
+            profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(20)
+        return out.getvalue()
+    finally:
+        profiler = None
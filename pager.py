@@ -0,0 +1,144 @@
+import mmap
+import os
+from bisect import bisect_left
+
+# The line index keeps one entry per block of this many bytes.
+BLOCK_SIZE = 1 << 16
+# Bytes indexed or searched per step, so the UI stays responsive.
+INDEX_STEP = 1 << 25
+SEARCH_STEP = 1 << 24
+# Longer lines are cut off for display.
+MAX_LINE_BYTES = 4096
+
+class MappedText:
+    """Line-oriented read access to a file of any size through mmap.
+
+    Nothing is read until it is asked for. The line index counts the
+    newlines in each BLOCK_SIZE block, once, up to the furthest line
+    requested (or in steps with index_step()); finding a line is then a
+    bisect plus a scan of one block. The file may grow while it is open,
+    as a spill file does; refresh() maps what was appended.
+    """
+
+    def __init__(self, path=None, file=None):
+        self.owns_file = file is None
+        self.file = open(path, "rb") if file is None else file
+        self.mm = None
+        self.size = 0
+        # block_lines[i] is the number of newlines before block i.
+        self.block_lines = [0]
+        self.refresh()
+
+    def refresh(self):
+        """Map what was appended since the last call; True if anything was."""
+        self.file.flush()
+        size = os.fstat(self.file.fileno()).st_size
+        if size <= self.size:
+            return False
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        self.size = size
+        return True
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.owns_file:
+            self.file.close()
+
+    def _extend(self):
+        """Index one more whole block; False once only a partial one is left."""
+        start = (len(self.block_lines) - 1) * BLOCK_SIZE
+        if start + BLOCK_SIZE > self.size:
+            return False
+        self.block_lines.append(self.block_lines[-1] + self.mm[start:start + BLOCK_SIZE].count(b"\n"))
+        return True
+
+    def index_step(self, limit=INDEX_STEP):
+        """Index up to `limit` more bytes; True once the index is complete."""
+        for _ in range(max(1, limit // BLOCK_SIZE)):
+            if not self._extend():
+                return True
+        return False
+
+    def indexed(self):
+        return (len(self.block_lines) - 1) * BLOCK_SIZE + BLOCK_SIZE > self.size
+
+    def known_lines(self):
+        """Lines found so far; the line count once indexed() is true."""
+        if not self.indexed():
+            return self.block_lines[-1]
+        start = (len(self.block_lines) - 1) * BLOCK_SIZE
+        count = self.block_lines[-1] + self.mm[start:self.size].count(b"\n") if self.size else 0
+        # A last line without a newline counts too.
+        if self.size and self.mm[self.size - 1] != ord("\n"):
+            count += 1
+        return count
+
+    def line_count(self):
+        while self._extend():
+            pass
+        return self.known_lines()
+
+    def line_offset(self, line):
+        """Byte offset where `line` (0-based) starts, or None past the end."""
+        if self.size == 0:
+            return None
+        if line <= 0:
+            return 0
+        while self.block_lines[-1] < line and self._extend():
+            pass
+        # The last block with fewer than `line` newlines before it holds
+        # the newline that ends the line before.
+        block = bisect_left(self.block_lines, line) - 1
+        pos = block * BLOCK_SIZE - 1
+        for _ in range(line - self.block_lines[block]):
+            pos = self.mm.find(b"\n", pos + 1)
+            if pos < 0:
+                return None
+        return pos + 1 if pos + 1 < self.size else None
+
+    def line_at(self, offset):
+        """Number of the line that contains byte `offset`."""
+        if self.size == 0:
+            return 0
+        block = offset // BLOCK_SIZE
+        while len(self.block_lines) <= block and self._extend():
+            pass
+        block = min(block, len(self.block_lines) - 1)
+        return self.block_lines[block] + self.mm[block * BLOCK_SIZE:offset].count(b"\n")
+
+    def lines(self, first, count):
+        """Up to `count` (offset, text) pairs from line `first` on."""
+        result = []
+        pos = self.line_offset(first)
+        while pos is not None and pos < self.size and len(result) < count:
+            end = self.mm.find(b"\n", pos)
+            if end < 0:
+                end = self.size
+            data = self.mm[pos:min(end, pos + MAX_LINE_BYTES)]
+            result.append((pos, data.rstrip(b"\r").decode("utf-8", errors="replace")))
+            pos = end + 1
+        return result
+
+    def search(self, needle, offset, forward=True, limit=SEARCH_STEP):
+        """One step of a search for the bytes `needle`, scanning at most
+        `limit` bytes after `offset` (or before it when not `forward`).
+        Returns (match, resume): the offset of the nearest match or None,
+        and where the next step continues, or None if there is none."""
+        if not needle or self.size == 0:
+            return None, None
+        if forward:
+            end = min(self.size, offset + limit)
+            # A match has to start in the scanned range, not end in it.
+            match = self.mm.find(needle, offset, min(self.size, end + len(needle) - 1))
+            if match >= 0:
+                return match, None
+            return None, (end if end < self.size else None)
+        start = max(0, offset - limit)
+        match = self.mm.rfind(needle, start, min(self.size, offset + len(needle) - 1))
+        if match >= 0:
+            return match, None
+        return None, (start if start > 0 else None)
@@ -0,0 +1,261 @@
+from PyQt5.QtWidgets import QAbstractScrollArea
+from PyQt5.QtGui import QPainter, QPalette
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+
+from ansi import strip_escapes
+
+# How often a file that is still being written is checked for more text.
+REFRESH_MS = 200
+TAB_WIDTH = 8
+HORIZONTAL_STEP = 8
+
+class PagerView(QAbstractScrollArea):
+    """A `less`-like view of a MappedText that paints only the visible lines.
+
+    The scrollbar covers the lines indexed so far and grows as the index
+    is built in the background. Keys: arrows, j/k, Space/b, PageUp/Down,
+    g/G or Home/End, F to follow a growing file, / and ? to search
+    forwards and backwards, n/N to repeat, q or Escape to close. Searches
+    scan the map in steps between events, so the view stays responsive.
+    """
+
+    closed = pyqtSignal()
+    interrupted = pyqtSignal()
+
+    def __init__(self, text, title, live=False, parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.title = title
+        self.left = 0
+        self.follow = False
+        # What is typed after / or ?, while it is being typed.
+        self.query = None
+        self.needle = None
+        self.forward = True
+        self.match = None
+        self.search_from = None
+        self.search_forward = True
+        self.message = ""
+        # So a style sheet's colors end up where paintEvent looks for them.
+        self.setBackgroundRole(QPalette.Base)
+        self.setForegroundRole(QPalette.Text)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.index_step)
+        self.index_timer.start(0)
+        self.search_timer = QTimer(self)
+        self.search_timer.timeout.connect(self.search_step)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.set_live(live)
+
+    def set_live(self, live):
+        """Whether the file is still being written to."""
+        self.refresh()
+        if live:
+            self.refresh_timer.start(REFRESH_MS)
+        else:
+            self.refresh_timer.stop()
+
+    def refresh(self):
+        if not self.text.refresh():
+            return
+        self.index_timer.start(0)
+        self.update_scrollbar()
+        if self.follow:
+            self.scroll_to_end()
+        self.viewport().update()
+
+    def index_step(self):
+        if self.text.index_step():
+            self.index_timer.stop()
+        self.update_scrollbar()
+
+    def line_height(self):
+        return self.fontMetrics().lineSpacing()
+
+    def page_lines(self):
+        # The last row is the status line.
+        return max(1, self.viewport().height() // self.line_height() - 1)
+
+    def top(self):
+        return self.verticalScrollBar().value()
+
+    def update_scrollbar(self):
+        bar = self.verticalScrollBar()
+        bar.setRange(0, max(0, self.text.known_lines() - self.page_lines()))
+        bar.setPageStep(self.page_lines())
+        bar.setSingleStep(1)
+
+    def scroll_to(self, line):
+        self.verticalScrollBar().setValue(line)
+
+    def scroll_to_end(self):
+        # Completes the index; it is built in steps of a few ms anyway.
+        self.text.line_count()
+        self.index_timer.stop()
+        self.update_scrollbar()
+        self.scroll_to(self.verticalScrollBar().maximum())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbar()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.Base))
+        painter.setFont(self.font())
+        metrics = self.fontMetrics()
+        height = self.line_height()
+        ascent = metrics.ascent()
+        char_width = metrics.horizontalAdvance(" ")
+        columns = max(1, self.viewport().width() // char_width)
+        lines = self.text.lines(self.top(), self.page_lines())
+        for row, (offset, line) in enumerate(lines):
+            y = row * height
+            column = self.match_column(offset, line)
+            if "\x1b" in line:
+                # Spilled output keeps its color codes; they are not shown.
+                line = strip_escapes(line)
+            shown = line.expandtabs(TAB_WIDTH)
+            if column is not None:
+                width = len(self.needle.decode("utf-8", errors="replace"))
+                painter.fillRect((column - self.left) * char_width, y, width * char_width, height,
+                                 palette.color(QPalette.Highlight))
+            painter.setPen(palette.color(QPalette.Text))
+            painter.drawText(0, y + ascent, shown[self.left:self.left + columns])
+        status_y = self.page_lines() * height
+        painter.fillRect(0, status_y, self.viewport().width(), height, palette.color(QPalette.Text))
+        painter.setPen(palette.color(QPalette.Base))
+        painter.drawText(0, status_y + ascent, self.status_text(len(lines))[:columns])
+
+    def match_column(self, offset, line):
+        """Column where the current match starts if it is on this line."""
+        if self.match is None or not offset <= self.match < offset + len(line.encode("utf-8")):
+            return None
+        prefix = self.text.mm[offset:self.match]
+        if b"\n" in prefix:
+            return None
+        return len(strip_escapes(prefix.decode("utf-8", errors="replace")).expandtabs(TAB_WIDTH))
+
+    def status_text(self, shown):
+        if self.query is not None:
+            return ("/" if self.forward else "?") + self.query
+        if self.message:
+            return self.message
+        top = self.top()
+        total = self.text.known_lines()
+        more = "" if self.text.indexed() else "+"
+        status = f"{self.title}  lines {top + 1 if shown else 0}-{top + shown} of {total}{more}"
+        if self.follow:
+            status += "  (following)"
+        elif top >= self.verticalScrollBar().maximum() and not more:
+            status += "  (END)"
+        return status
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        text = event.text()
+        if event.modifiers() == Qt.ControlModifier and key == Qt.Key_C:
+            self.interrupted.emit()
+            return
+        if self.query is not None:
+            self.edit_query(key, text)
+            return
+        if self.search_timer.isActive():
+            if key == Qt.Key_Escape:
+                self.search_timer.stop()
+                self.message = "Search cancelled"
+                self.viewport().update()
+            return
+        self.message = ""
+        page = self.page_lines()
+        if key in (Qt.Key_Q, Qt.Key_Escape):
+            self.closed.emit()
+            return
+        if key in (Qt.Key_Down, Qt.Key_J, Qt.Key_Return, Qt.Key_Enter):
+            self.scroll_to(self.top() + 1)
+        elif key in (Qt.Key_Up, Qt.Key_K):
+            self.scroll_to(self.top() - 1)
+        elif key in (Qt.Key_PageDown, Qt.Key_Space, Qt.Key_F) and text != "F":
+            self.scroll_to(self.top() + page)
+        elif key in (Qt.Key_PageUp, Qt.Key_B):
+            self.scroll_to(self.top() - page)
+        elif key == Qt.Key_Home or text == "g":
+            self.scroll_to(0)
+        elif key == Qt.Key_End or text == "G":
+            self.scroll_to_end()
+        elif text == "F":
+            self.scroll_to_end()
+        elif key == Qt.Key_Right:
+            self.left += HORIZONTAL_STEP
+        elif key == Qt.Key_Left:
+            self.left = max(0, self.left - HORIZONTAL_STEP)
+        elif text in ("/", "?"):
+            self.forward = text == "/"
+            self.query = ""
+        elif text in ("n", "N") and self.needle:
+            self.start_search((text == "n") == self.forward)
+        else:
+            super().keyPressEvent(event)
+            return
+        self.follow = text == "F"
+        self.viewport().update()
+
+    def edit_query(self, key, text):
+        if key == Qt.Key_Escape:
+            self.query = None
+        elif key in (Qt.Key_Return, Qt.Key_Enter):
+            query, self.query = self.query, None
+            if query:
+                self.needle = query.encode("utf-8")
+                self.match = None
+            if self.needle:
+                self.start_search(self.forward)
+        elif key == Qt.Key_Backspace:
+            if self.query:
+                self.query = self.query[:-1]
+            else:
+                self.query = None
+        elif text and text.isprintable():
+            self.query += text
+        self.viewport().update()
+
+    def start_search(self, forward):
+        """Search on from the current match, or from the top line."""
+        self.search_forward = forward
+        if self.match is not None:
+            self.search_from = self.match + 1 if forward else self.match
+        elif forward:
+            offset = self.text.line_offset(self.top() + 1)
+            self.search_from = self.text.size if offset is None else offset
+        else:
+            offset = self.text.line_offset(self.top())
+            self.search_from = 0 if offset is None else offset
+        self.search_timer.start(0)
+        self.search_step()
+
+    def search_step(self):
+        match, resume = self.text.search(self.needle, self.search_from, self.search_forward)
+        if match is not None:
+            self.search_timer.stop()
+            self.match = match
+            self.message = ""
+            self.follow = False
+            line = self.text.line_at(match)
+            self.update_scrollbar()
+            if self.verticalScrollBar().maximum() < line:
+                # Past the indexed lines: index up to the match first.
+                self.text.line_offset(line + self.page_lines())
+                self.update_scrollbar()
+            self.scroll_to(line)
+        elif resume is None:
+            self.search_timer.stop()
+            self.message = "Pattern not found"
+        else:
+            self.search_from = resume
+            done = resume if self.search_forward else self.text.size - resume
+            self.message = f"Searching... {done * 100 // max(1, self.text.size)}%"
+        self.viewport().update()
@@ -0,0 +1,141 @@
+import os
+import pickle
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from autocomplete_trie import compile_trie
+
+CACHE_FILE = os.path.expanduser("~/.shell_path_cache")
+CACHE_VERSION = 2
+# A directory modified this close to its scan may have changed again within
+# the same mtime tick, so its listing is not trusted on the next launch.
+RACY_MTIME_NS = 2 * 10**9
+
+def path_directories():
+    path_env = os.environ.get("PATH")
+    if not path_env:
+        return []
+    paths = path_env.split(":") if os.name != 'nt' else path_env.split(";")
+    paths.append(".")
+    return paths
+
+def scan_directory(path):
+    """Map executable names in `path` to their full paths.
+
+    Uses one stat per entry (answered from the directory listing itself on
+    Windows) instead of separate isfile/access calls.
+    """
+    files = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    mode = entry.stat().st_mode
+                except OSError:
+                    continue
+                if stat.S_ISREG(mode) and mode & 0o111:
+                    files[entry.name] = os.path.join(path, entry.name)
+    except OSError:
+        pass
+    return files
+
+def load_cache(cache_file=CACHE_FILE):
+    try:
+        with open(cache_file, "rb") as f:
+            cache = pickle.load(f)
+    except Exception:
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    cache["version"] = CACHE_VERSION
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+def _refresh_directory(path, cached):
+    """Return (key, mtime_ns, scanned_at, files, changed) for one PATH entry,
+    reusing `cached` when the directory mtime still matches. `changed`
+    says whether its executable names differ from the cached ones."""
+    key = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return key, None, None, {}, False
+    entry = cached.get(key)
+    if entry is not None:
+        cached_mtime, scanned_at, files = entry
+        if cached_mtime == mtime and scanned_at - mtime > RACY_MTIME_NS:
+            # Cached values were built from the absolute key; rebase them on
+            # the PATH spelling the user has now.
+            return key, mtime, scanned_at, {name: os.path.join(path, name) for name in files}, False
+    scanned_at = time.time_ns()
+    files = scan_directory(path)
+    # A directory is modified by much more than adding executables.
+    return key, mtime, scanned_at, files, entry is None or set(files) != set(entry[2])
+
+def scan_path(paths, cached_dirs=None, max_workers=None):
+    """Scan `paths` concurrently. Returns (file_map, dirs, changed) where
+    `dirs` is the new per-directory cache and `changed` says whether the
+    executables in any directory differ from `cached_dirs`."""
+    cached_dirs = cached_dirs or {}
+    if not paths:
+        return {}, {}, bool(cached_dirs)
+    max_workers = max_workers or min(32, len(paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda path: _refresh_directory(path, cached_dirs), paths))
+    file_map = {}
+    dirs = {}
+    changed = False
+    for key, mtime, scanned_at, files, names_changed in results:
+        # Later PATH entries override earlier ones, as before.
+        file_map.update(files)
+        if mtime is not None:
+            dirs[key] = (mtime, scanned_at, tuple(files))
+        changed = changed or names_changed
+    if set(dirs) != set(cached_dirs):
+        changed = True
+    return file_map, dirs, changed
+
+def populate_path_map():
+    file_map, _, _ = scan_path(path_directories())
+    return file_map
+
+def load_path_index(builtins, cache_file=CACHE_FILE):
+    """Return (path_map, trie), reusing the on-disk snapshot for every PATH
+    directory whose mtime is unchanged and rescanning only the rest. The
+    trie is only compiled again when the executable names change.
+
+    `.` is left out of the snapshot and listed on every call: what it holds
+    depends on where the shell starts, and when that is `~`, saving the
+    snapshot itself changes its mtime.
+    """
+    paths = path_directories()
+    cached_paths = [path for path in paths if path != "."]
+    cache = load_cache(cache_file)
+    path_map, dirs, changed = scan_path(cached_paths, cache.get("dirs"))
+    trie_key = (tuple(os.path.abspath(path) for path in cached_paths), tuple(builtins))
+    trie = cache.get("trie")
+    stale = changed or trie is None or cache.get("trie_key") != trie_key
+    if stale:
+        trie = compile_trie(list(path_map.keys()) + list(builtins))
+    if stale or dirs != cache.get("dirs"):
+        # Also when only mtimes moved on, so the next call skips the listing.
+        save_cache({"dirs": dirs, "trie_key": trie_key, "trie": trie}, cache_file)
+    if "." in paths:
+        local = scan_directory(".")
+        for name in local:
+            if name not in path_map and name not in builtins:
+                trie.insert(name)
+        path_map.update(local)
+    return path_map, trie
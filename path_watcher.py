@@ -0,0 +1,180 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import stat
+import struct
+import threading
+
+from path_index import scan_directory
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+def _load_inotify():
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+def _is_executable(path):
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False
+    return stat.S_ISREG(mode) and bool(mode & 0o111)
+
+class PathWatcher(threading.Thread):
+    """Watch PATH directories and report executables that appear or vanish.
+
+    Runs on its own daemon thread using inotify where available and mtime
+    polling otherwise. `on_change` is called from that thread with a dict
+    mapping each affected command name to its new full path, or None if it
+    no longer resolves; it must hand the work over to whichever thread owns
+    the path map and trie.
+    """
+
+    def __init__(self, paths, path_map, on_change, interval=2.0):
+        super().__init__(name="PathWatcher", daemon=True)
+        # "." is watched as the directory it meant when the index was built.
+        self.paths = [os.path.abspath(path) if path == "." else path for path in paths]
+        self.resolved = dict(path_map)
+        self.on_change = on_change
+        self.interval = interval
+        self.listings = {}
+        self.mtimes = {}
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        for path in self.paths:
+            self._rescan(path)
+        # Report anything that changed between the index build and now.
+        self._emit(set(self.resolved).union(*self.listings.values()))
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                try:
+                    self._watch_inotify(libc, fd)
+                finally:
+                    os.close(fd)
+                return
+        self._watch_polling()
+
+    def _rescan(self, path):
+        try:
+            self.mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            self.mtimes[path] = None
+        old = self.listings.get(path, set())
+        new = set(scan_directory(path)) if self.mtimes[path] is not None else set()
+        self.listings[path] = new
+        return old ^ new
+
+    def _resolve(self, name):
+        target = None
+        for path in self.paths:
+            # Later PATH entries override earlier ones, matching path_index.
+            if name in self.listings.get(path, ()):
+                target = os.path.join(path, name)
+        return target
+
+    def _emit(self, names):
+        changes = {}
+        for name in names:
+            target = self._resolve(name)
+            if self.resolved.get(name) != target:
+                changes[name] = target
+                if target is None:
+                    self.resolved.pop(name, None)
+                else:
+                    self.resolved[name] = target
+        if changes:
+            self.on_change(changes)
+
+    def _watch_polling(self):
+        while not self._stop_event.wait(self.interval):
+            affected = set()
+            for path in self.paths:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime != self.mtimes.get(path):
+                    affected |= self._rescan(path)
+            self._emit(affected)
+
+    def _watch_inotify(self, libc, fd):
+        watches = {}
+
+        def add_watch(path):
+            wd = libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = path
+            return wd >= 0
+
+        for path in set(self.paths):
+            add_watch(path)
+        while not self._stop_event.is_set():
+            affected = set()
+            # Directories that did not exist yet are retried on every tick.
+            for path in set(self.paths) - set(watches.values()):
+                if os.path.isdir(path) and add_watch(path):
+                    affected |= self._rescan(path)
+            readable, _, _ = select.select([fd], [], [], self.interval)
+            if readable:
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b""
+                affected |= self._read_events(data, watches, lambda wd: libc.inotify_rm_watch(fd, wd))
+            self._emit(affected)
+
+    def _read_events(self, data, watches, remove_watch):
+        affected = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                for path in set(watches.values()):
+                    affected |= self._rescan(path)
+                continue
+            path = watches.get(wd)
+            if path is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                if mask & IN_MOVE_SELF:
+                    remove_watch(wd)
+                del watches[wd]
+                affected |= self._rescan(path)
+            elif name:
+                listing = self.listings.setdefault(path, set())
+                if _is_executable(os.path.join(path, name)):
+                    listing.add(name)
+                else:
+                    listing.discard(name)
+                affected.add(name)
+        return affected
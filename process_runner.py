@@ -0,0 +1,480 @@
+import codecs
+import io
+import os
+import signal
+import subprocess
+import threading
+from collections import Counter
+
+from redirection import PipeEnd, Redirections, STDOUT, STDERR, close_files
+
+READ_SIZE = 64 * 1024
+
+def _pump(stream, on_output):
+    """Drain `stream`, decoding it and feeding `on_output`."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    fd = stream.fileno()
+    try:
+        while True:
+            chunk = os.read(fd, READ_SIZE)
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            if text:
+                on_output(text)
+        text = decoder.decode(b"", final=True)
+        if text:
+            on_output(text)
+    finally:
+        stream.close()
+
+def _session_kwargs():
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+def _signal_group(process, sig):
+    try:
+        if os.name == 'nt':
+            process.send_signal(sig)
+        else:
+            os.killpg(process.pid, sig)
+    except (OSError, ProcessLookupError):
+        pass
+
+def _reap(process):
+    """Wait for `process` and return its resource usage, or None where
+    os.wait4 is not available.
+
+    Children are only ever reaped here; everything else checks
+    `returncode`, so no poll() can reap a child before wait4 sees it.
+    A child killed by signal N gets the shell's status 128 + N rather
+    than subprocess's -N.
+    """
+    usage = None
+    if not hasattr(os, "wait4"):
+        process.wait()
+    else:
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            process.wait()
+    if process.returncode < 0:
+        process.returncode = 128 - process.returncode
+    return usage
+
+def _interrupt(process):
+    _signal_group(process, signal.CTRL_BREAK_EVENT if os.name == 'nt' else signal.SIGINT)
+
+class ProcessRunner:
+    """Run an external command without blocking the caller.
+
+    Redirect targets from `redirects` are opened once and become the
+    child's own stdin, stdout and stderr, so redirected data never passes
+    through this process. Streams that are not redirected are read on
+    background threads in chunks of at most READ_SIZE bytes, decoded and
+    passed to `on_output(text)`, or stderr to `on_error(text)` if given.
+    `on_exit(returncode)` runs once they are drained. The callbacks are
+    invoked from worker threads.
+    """
+
+    def __init__(self, argv, cwd=None, redirects=None, executable=None, env=None):
+        self.argv = argv
+        self.cwd = cwd
+        self.env = env
+        self.executable = executable
+        self.redirects = redirects if redirects is not None else Redirections()
+        self.process = None
+        self.usage = []
+
+    def start(self, on_output, on_exit, on_error=None):
+        # Open redirect targets up front so errors surface before the child runs.
+        stdin, stdout, stderr = self.redirects.open()
+        on_error = on_error or on_output
+        if stdout == STDERR:
+            # `>&2`: stdout is read back like stderr.
+            stdout = None
+            on_output = on_error
+        try:
+            self.process = subprocess.Popen(
+                self.argv,
+                executable=self.executable,
+                cwd=self.cwd,
+                env=self.env,
+                stdin=stdin or subprocess.DEVNULL,
+                stdout=stdout or subprocess.PIPE,
+                stderr=subprocess.STDOUT if stderr == STDOUT else stderr or subprocess.PIPE,
+                **_session_kwargs(),
+            )
+        finally:
+            # The child has its own copies of the descriptors.
+            close_files(stdin, stdout, stderr)
+        readers = [
+            threading.Thread(target=_pump, args=(stream, callback), daemon=True)
+            for stream, callback in ((self.process.stdout, on_output), (self.process.stderr, on_error))
+            if stream is not None
+        ]
+        for reader in readers:
+            reader.start()
+        threading.Thread(target=self._wait, args=(readers, on_exit), daemon=True).start()
+
+    def _wait(self, readers, on_exit):
+        for reader in readers:
+            reader.join()
+        usage = _reap(self.process)
+        if usage is not None:
+            self.usage.append(usage)
+        on_exit(self.process.returncode)
+
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    def pids(self):
+        return [self.process.pid] if self.process is not None else []
+
+    def send_signal(self, sig):
+        if self.running():
+            _signal_group(self.process, sig)
+
+    def interrupt(self):
+        """Deliver Ctrl+C to the command's whole process group."""
+        if self.running():
+            _interrupt(self.process)
+
+    def terminate(self):
+        if self.running():
+            self.process.kill()
+
+class PipelineStage:
+    """One command of a pipeline: an external `argv` run in `cwd` with
+    `env` (from `executable` if given), or a `builtin` callable returning
+    (stdout, stderr, status) strings."""
+
+    def __init__(self, argv=None, cwd=None, builtin=None, redirects=None, executable=None, env=None):
+        self.argv = argv
+        self.cwd = cwd
+        self.env = env
+        self.executable = executable
+        self.builtin = builtin
+        self.redirects = redirects if redirects is not None else Redirections()
+
+class Pipeline:
+    """Run `a | b | c` with every stage started at once.
+
+    Adjacent external stages are joined by OS pipes, so their data never
+    passes through this process. Builtin stages run on a thread that writes
+    into the pipe. Only the last stage's stdout and every stage's stderr are
+    read back for display. `statuses` holds each stage's exit code once
+    `on_exit` has been called with the last one.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.processes = []
+        self.statuses = []
+        self.usage = []
+
+    def start(self, on_output, on_exit, on_error=None):
+        on_error = on_error or on_output
+        workers = []
+        results = {}
+        prev_read = None
+        try:
+            for idx, stage in enumerate(self.stages):
+                stdin, stdout, stderr = stage.redirects.open()
+                next_read = None
+                if prev_read is not None:
+                    # An explicit `<` wins over the pipe from the last stage.
+                    if stdin is None:
+                        stdin = open(prev_read, "rb", buffering=0)
+                    else:
+                        os.close(prev_read)
+                    prev_read = None
+                if stdout in (None, STDERR):
+                    read_end, write_end = os.pipe()
+                    if stdout == STDERR:
+                        # `>&2`: read back like stderr; the next stage gets no input.
+                        workers.append(self._start_thread(_pump, open(read_end, "rb", buffering=0), on_error))
+                    elif idx == len(self.stages) - 1:
+                        workers.append(self._start_thread(_pump, open(read_end, "rb", buffering=0), on_output))
+                    else:
+                        next_read = read_end
+                    stdout = open(write_end, "wb", buffering=0)
+                if stderr == STDOUT:
+                    stderr = stdout
+                if stage.builtin is not None:
+                    close_files(stdin)
+                    workers.append(self._start_thread(
+                        self._run_builtin, idx, stage.builtin, stdout, stderr, on_error, results))
+                    prev_read = next_read
+                    continue
+                try:
+                    process = subprocess.Popen(
+                        stage.argv,
+                        executable=stage.executable,
+                        cwd=stage.cwd,
+                        env=stage.env,
+                        stdin=stdin or subprocess.DEVNULL,
+                        stdout=stdout,
+                        stderr=stderr or subprocess.PIPE,
+                        **_session_kwargs(),
+                    )
+                except OSError:
+                    if next_read is not None:
+                        os.close(next_read)
+                    raise
+                finally:
+                    # The child has its own copies of the descriptors.
+                    close_files(stdin, stdout, stderr)
+                self.processes.append((idx, process))
+                if stderr is None:
+                    workers.append(self._start_thread(_pump, process.stderr, on_error))
+                prev_read = next_read
+        except OSError:
+            if prev_read is not None:
+                os.close(prev_read)
+            self.terminate()
+            raise
+        threading.Thread(target=self._wait, args=(workers, results, on_exit), daemon=True).start()
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def _run_builtin(self, idx, builtin, stdout, stderr, on_error, results):
+        out, err, status = builtin()
+        try:
+            stdout.write(out.encode())
+            if err and stderr is not None:
+                stderr.write(err.encode())
+        except BrokenPipeError:
+            pass
+        finally:
+            close_files(stdout, stderr)
+        if err and stderr is None:
+            on_error(err)
+        results[idx] = status
+
+    def _wait(self, workers, results, on_exit):
+        for worker in workers:
+            worker.join()
+        for idx, process in self.processes:
+            usage = _reap(process)
+            if usage is not None:
+                self.usage.append(usage)
+            results[idx] = process.returncode
+        self.statuses = [results[idx] for idx in range(len(self.stages))]
+        on_exit(self.statuses[-1])
+
+    def running(self):
+        return any(process.returncode is None for _, process in self.processes)
+
+    def pids(self):
+        return [process.pid for _, process in self.processes]
+
+    def send_signal(self, sig):
+        for _, process in self.processes:
+            if process.returncode is None:
+                _signal_group(process, sig)
+
+    def interrupt(self):
+        for _, process in self.processes:
+            if process.returncode is None:
+                _interrupt(process)
+
+    def terminate(self):
+        for _, process in self.processes:
+            if process.returncode is None:
+                process.kill()
+
+class ParallelRunner:
+    """Run `argv` once per input item with at most `jobs` at a time, like
+    `xargs -P` or GNU parallel.
+
+    Items come from `items`, from the `<` file in `redirects`, or line by
+    line from the output of `producer`, a Pipeline. An item replaces `{}`
+    in the arguments, or is appended when there is none. Each command's
+    stdout and stderr are collected together and released in input order
+    as soon as every earlier command has finished, followed by a summary
+    of exit codes. The exit status is the number of failures, at most 101.
+    """
+
+    def __init__(self, argv, executable=None, items=None, producer=None, jobs=None, redirects=None,
+                 cwd=None, env=None):
+        self.argv = argv
+        self.executable = executable
+        self.cwd = cwd
+        self.env = env
+        self.items = items
+        self.producer = producer
+        self.jobs = jobs or os.cpu_count() or 1
+        self.redirects = redirects if redirects is not None else Redirections()
+        self.statuses = []
+        self.usage = []
+        self.processes = set()
+        self._lock = threading.Lock()
+        self._results = {}
+        self._next = 0
+        self._skipped = 0
+        self._stopping = False
+        self._done = threading.Event()
+        self._producer_done = threading.Event()
+
+    def start(self, on_output, on_exit, on_error=None):
+        # Each command's stderr stays with its stdout; only the producer's
+        # stderr goes to `on_error`.
+        self._on_output = on_output
+        stdin, self._stdout, stderr = self.redirects.open()
+        if self._stdout == STDERR:
+            self._stdout = None
+            self._on_output = on_error or on_output
+        self._stderr = None if stderr in (None, STDOUT) else stderr
+        source = io.BufferedReader(stdin) if stdin is not None else None
+        if self.producer is not None:
+            close_files(source)
+            read_fd, write_fd = os.pipe()
+            self.producer.stages[-1].redirects.stdout = PipeEnd(write_fd)
+            try:
+                self.producer.start(on_output, lambda status: self._producer_done.set(), on_error)
+            except OSError:
+                os.close(read_fd)
+                close_files(self._stdout, self._stderr)
+                raise
+            finally:
+                os.close(write_fd)
+            source = open(read_fd, "rb")
+        else:
+            self._producer_done.set()
+        threading.Thread(target=self._run, args=(source, on_exit), daemon=True).start()
+
+    def _command(self, item):
+        if any("{}" in arg for arg in self.argv[1:]):
+            return self.argv[:1] + [arg.replace("{}", item) for arg in self.argv[1:]]
+        return self.argv + [item]
+
+    def _run(self, source, on_exit):
+        # Imported here so that starting the shell does not pay for it.
+        from concurrent.futures import ThreadPoolExecutor
+        items = self.items
+        if source is not None:
+            lines = (line.decode("utf-8", errors="replace").rstrip("\r\n") for line in source)
+            items = (line for line in lines if line)
+        pool = ThreadPoolExecutor(max_workers=self.jobs)
+        # Items can be a stream of any length; only read ahead a little.
+        slots = threading.Semaphore(2 * self.jobs)
+        error = None
+        try:
+            for idx, item in enumerate(items):
+                if self._stopping:
+                    break
+                slots.acquire()
+                pool.submit(self._run_item, idx, item).add_done_callback(lambda _: slots.release())
+        except Exception as e:
+            # Reading the items failed part way; finish what was started.
+            error = e
+        finally:
+            if source is not None:
+                source.close()
+            pool.shutdown(wait=True)
+            self._producer_done.wait()
+            failed = Counter(status for status in self.statuses if status != 0)
+            jobs = "job" if len(self.statuses) == 1 else "jobs"
+            summary = f"parallel: {len(self.statuses)} {jobs}, {len(self.statuses) - sum(failed.values())} succeeded"
+            if failed:
+                summary += ", " + ", ".join(f"{count} exited {status}" for status, count in sorted(failed.items()))
+            if self._skipped:
+                summary += f", {self._skipped} not started"
+            if error is not None:
+                summary += f", stopped reading items: {error}"
+            self._report(summary + "\n")
+            close_files(self._stdout, self._stderr)
+            self._done.set()
+            status = min(sum(failed.values()), 101)
+            on_exit(130 if self._stopping else max(status, 1) if error is not None else status)
+
+    def _run_item(self, idx, item):
+        if self._stopping:
+            self._finished(idx, b"", None)
+            return
+        try:
+            process = subprocess.Popen(
+                self._command(item),
+                executable=self.executable,
+                cwd=self.cwd,
+                env=self.env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr or subprocess.STDOUT,
+                **_session_kwargs(),
+            )
+        except OSError as e:
+            self._finished(idx, f"parallel: {self.argv[0]}: {e.strerror}\n".encode(), 127)
+            return
+        with self._lock:
+            self.processes.add(process)
+        # stderr is merged or goes to a file, so stdout is the only pipe.
+        output = process.stdout.read()
+        process.stdout.close()
+        usage = _reap(process)
+        with self._lock:
+            self.processes.discard(process)
+            if usage is not None:
+                self.usage.append(usage)
+        self._finished(idx, output, process.returncode)
+
+    def _finished(self, idx, output, status):
+        with self._lock:
+            self._results[idx] = (output, status)
+            while self._next in self._results:
+                output, status = self._results.pop(self._next)
+                self._next += 1
+                if status is None:
+                    self._skipped += 1
+                    continue
+                self.statuses.append(status)
+                if not output:
+                    continue
+                if self._stdout is not None:
+                    self._stdout.write(output)
+                else:
+                    self._on_output(output.decode("utf-8", errors="replace"))
+
+    def _report(self, text):
+        if self._stderr is not None:
+            self._stderr.write(text.encode())
+        else:
+            self._on_output(text)
+
+    def _live(self):
+        with self._lock:
+            return [process for process in self.processes if process.returncode is None]
+
+    def running(self):
+        return not self._done.is_set()
+
+    def pids(self):
+        pids = self.producer.pids() if self.producer is not None else []
+        return pids + [process.pid for process in self._live()]
+
+    def send_signal(self, sig):
+        if self.producer is not None:
+            self.producer.send_signal(sig)
+        for process in self._live():
+            _signal_group(process, sig)
+
+    def interrupt(self):
+        """Start nothing new and deliver Ctrl+C to what is running."""
+        self._stopping = True
+        if self.producer is not None:
+            self.producer.interrupt()
+        for process in self._live():
+            _interrupt(process)
+
+    def terminate(self):
+        self._stopping = True
+        if self.producer is not None:
+            self.producer.terminate()
+        for process in self._live():
+            process.kill()
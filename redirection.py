@@ -0,0 +1,138 @@
+import os
+
+# Stands in for stderr after `2>&1` when stdout is not redirected, i.e.
+# "wherever stdout goes": the display, or the next stage of a pipeline.
+STDOUT = "stdout"
+# Stands in for stdout after `>&2` when stderr is not redirected: the
+# shell's stderr, wherever the stderr of a command would be shown.
+STDERR = "stderr"
+
+class RedirectionError(OSError):
+    """A redirect target that could not be opened."""
+
+def report_error(sink, text):
+    # A QTextEdit used as the sink only has append().
+    getattr(sink, "error", sink.append)(text)
+
+class FileDescriptor:
+    def __init__(self, filepath, write_strategy):
+        self.filepath = filepath
+        self.write_strategy = write_strategy
+
+    def open(self):
+        return open(self.filepath, self.write_strategy + "b", buffering=0)
+
+class PipeEnd:
+    """A descriptor that is already open, used as a redirect target. Each
+    open() returns a duplicate, so `fd` stays with its owner."""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def open(self):
+        return open(os.dup(self.fd), "wb", buffering=0)
+
+class Redirections:
+    """The redirects of one command, applied left to right.
+
+    stdin is a FileDescriptor to read or None. stdout and stderr are a
+    FileDescriptor, None for the shell's display, STDERR for stdout or
+    STDOUT for stderr.
+    After `>out 2>&1` both streams hold the same FileDescriptor, so the
+    file is opened once and shared like a dup'ed fd.
+    """
+
+    def __init__(self):
+        self.stdin = None
+        self.stdout = None
+        self.stderr = None
+
+    def add(self, operator, target=None):
+        if operator == "<":
+            self.stdin = FileDescriptor(target, "r")
+        elif operator in [">", "1>", ">>", "1>>"]:
+            if self.stderr == STDOUT:
+                # `2>&1 >file` leaves stderr where stdout was.
+                self.stderr = None
+            self.stdout = FileDescriptor(target, "a" if operator.endswith(">>") else "w")
+        elif operator in ["2>", "2>>"]:
+            self.stderr = FileDescriptor(target, "a" if operator == "2>>" else "w")
+        elif operator in ["&>", "&>>"]:
+            self.stdout = self.stderr = FileDescriptor(target, "a" if operator == "&>>" else "w")
+        elif ">&" in operator:
+            source, target = operator.split(">&")
+            if target not in ["1", "2"]:
+                raise ValueError(f"{target}: Bad file descriptor")
+            if (source or "1") == target:
+                return
+            if target == "1":
+                self.stderr = {None: STDOUT, STDERR: None}.get(self.stdout, self.stdout)
+            else:
+                self.stdout = {None: STDERR, STDOUT: None}.get(self.stderr, self.stderr)
+
+    def open(self):
+        """Open each target once, returning (stdin, stdout, stderr).
+
+        Each is an unbuffered binary file or None; stdout can also be
+        STDERR and stderr STDOUT. Files are handed to child processes as they are, so
+        redirected data goes straight from the child to the file.
+        """
+        opened = {}
+        files = []
+        try:
+            for spec in (self.stdin, self.stdout, self.stderr):
+                if spec in (None, STDOUT, STDERR):
+                    files.append(spec)
+                    continue
+                if id(spec) not in opened:
+                    opened[id(spec)] = spec.open()
+                files.append(opened[id(spec)])
+        except OSError as e:
+            close_files(*opened.values())
+            raise RedirectionError(e.errno, e.strerror, e.filename) from e
+        return tuple(files)
+
+def close_files(*files):
+    for f in {f for f in files if f not in (None, STDOUT, STDERR)}:
+        f.close()
+
+class BuiltinOutput:
+    """stdout and stderr of a builtin that runs inside the shell.
+
+    Text for a redirected stream is buffered and written to its file in
+    one call by close(); the rest goes to `sink`. When both streams share
+    a file, their text keeps its order.
+    """
+
+    def __init__(self, redirects, sink):
+        self.sink = sink
+        stdin, self.stdout, self.stderr = redirects.open()
+        close_files(stdin)
+        if self.stderr == STDOUT:
+            self.stderr = self.stdout
+        self.buffers = {}
+
+    def _write(self, target, text):
+        if target is None:
+            self.sink.append(text)
+        else:
+            self.buffers.setdefault(target, []).append(text)
+
+    def write(self, text):
+        if self.stdout == STDERR:
+            report_error(self.sink, text)
+        else:
+            self._write(self.stdout, text)
+
+    def error(self, text):
+        if self.stderr is None:
+            report_error(self.sink, text)
+        else:
+            self._write(self.stderr, text)
+
+    def close(self):
+        try:
+            for target, chunks in self.buffers.items():
+                target.write("".join(chunks).encode("utf-8"))
+        finally:
+            close_files(self.stdout, self.stderr)
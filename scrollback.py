@@ -0,0 +1,39 @@
+import mmap
+import tempfile
+
+class ScrollbackFile:
+    """Append-only spill file for output evicted from the terminal widget.
+
+    Text is stored as UTF-8 in an unlinked temporary file and searched
+    through a read-only memory map, so old output costs no Python memory.
+    """
+
+    def __init__(self, directory=None):
+        self.file = tempfile.TemporaryFile(prefix="shell_scrollback_", dir=directory)
+        self.size = 0
+
+    def append(self, text):
+        data = text.encode("utf-8", errors="replace")
+        self.file.write(data)
+        self.size += len(data)
+
+    def search(self, needle, limit=200):
+        """Return up to `limit` spilled lines containing `needle`, oldest first."""
+        if not needle or self.size == 0:
+            return []
+        self.file.flush()
+        pattern = needle.encode("utf-8")
+        matches = []
+        with mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(pattern)
+            while pos >= 0 and len(matches) < limit:
+                start = mm.rfind(b"\n", 0, pos) + 1
+                end = mm.find(b"\n", pos)
+                if end < 0:
+                    end = self.size
+                matches.append(mm[start:end].decode("utf-8", errors="replace"))
+                pos = mm.find(pattern, end)
+        return matches
+
+    def close(self):
+        self.file.close()
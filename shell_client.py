@@ -0,0 +1,93 @@
+"""Run commands on a shell server (python main.py --serve).
+
+    python shell_client.py [-s SOCKET] -c COMMAND
+    python shell_client.py [-s SOCKET] < script
+
+Lines run one at a time in one session, starting in this directory, and
+output goes to stdout or stderr as the server sends it. Exits with the
+status of the last command.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+from shell_server import SOCKET_PATH
+
+class ShellClient:
+    def __init__(self, path=SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.replies = self.sock.makefile("rb")
+        self.next_id = 0
+        # Set once the session has run `exit`.
+        self.closed = False
+
+    def send(self, request):
+        self.sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+
+    def run(self, command, stdout=None, stderr=None, **settings):
+        """Run `command` and return its exit status, writing its output as
+        it arrives. `settings` may give "cwd" and "env" for the session."""
+        stdout = stdout or sys.stdout
+        stderr = stderr or sys.stderr
+        self.next_id += 1
+        request_id = self.next_id
+        self.send({"id": request_id, "command": command, **settings})
+        while True:
+            try:
+                line = self.replies.readline()
+            except KeyboardInterrupt:
+                self.send({"interrupt": True})
+                continue
+            if not line:
+                raise ConnectionError("server closed the connection")
+            frame = json.loads(line)
+            if "stream" in frame:
+                stream = stderr if frame["stream"] == "stderr" else stdout
+                stream.write(frame["data"])
+                stream.flush()
+            elif "error" in frame:
+                stderr.write(f"Error: {frame['error']}\n")
+                if frame["id"] == request_id:
+                    return 1
+            elif frame["id"] == request_id:
+                self.closed = frame.get("closed", False)
+                return frame["exit"]
+
+    def close(self):
+        self.replies.close()
+        self.sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--socket", default=SOCKET_PATH, help="server socket (default: %(default)s)")
+    parser.add_argument("-c", dest="command", metavar="COMMAND", help="run COMMAND and exit with its status")
+    args = parser.parse_args()
+
+    try:
+        client = ShellClient(args.socket)
+    except OSError as e:
+        sys.stderr.write(f"Error: {args.socket}: {e.strerror or e}\n")
+        sys.exit(1)
+    commands = [args.command] if args.command is not None else (line.rstrip("\n") for line in sys.stdin)
+    status = 0
+    settings = {"cwd": os.getcwd()}
+    try:
+        for command in commands:
+            if not command.strip():
+                continue
+            status = client.run(command, **settings)
+            settings = {}
+            if client.closed:
+                break
+    except ConnectionError as e:
+        sys.stderr.write(f"Error: {e}\n")
+        status = 1
+    finally:
+        client.close()
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
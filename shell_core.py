@@ -0,0 +1,828 @@
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from collections import ChainMap
+from contextvars import ContextVar
+from functools import partial
+from itertools import chain, islice
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import metrics
+from autocomplete_trie import iter_completions
+from command_hash import CommandHash
+from command_ranks import CommandRanks
+from glob_expand import GlobExpander
+from job_control import JobTable, DONE
+from process_runner import ProcessRunner, Pipeline, PipelineStage, ParallelRunner
+from redirection import Redirections, BuiltinOutput, RedirectionError, report_error
+from shell_lexer import (tokenize, split_command_list, is_dup, ShellSyntaxError, WORD, REDIRECT, PIPE, AND,
+                         AMP)
+
+builtins = ["exit", "echo", "type", "pwd", "clear", "jobs", "fg", "bg", "wait", "kill", "hash", "parallel", "time", "stats", "page"]
+command_hash = CommandHash()
+command_ranks = CommandRanks()
+path_map = {}
+trie = None
+# Guards the trie against PATH updates while a worker computes suggestions.
+trie_lock = threading.Lock()
+# True once this shell keeps a PATH index; headless runs never build one.
+# Until the first build finishes, commands are found by searching PATH and
+# there are no command completions.
+index_wanted = False
+_index_lock = threading.Lock()
+SUGGESTION_LIMIT = 50
+# Set by the GUI: show_pager(path) opens `path` in its pager view, or the
+# last output it paged when `path` is None. Returns an error message or None.
+show_pager = None
+# Lines copied per write when `page` has no pager to open.
+PAGE_COPY_BYTES = 1 << 20
+# Set by the GUI: called from the loader thread once the index has been
+# rebuilt after `export PATH`, so the PATH watcher can follow.
+index_rebuilt = None
+
+class Session:
+    """What one user of the shell sees: variables, the environment given
+    to commands, the working directory and the jobs.
+
+    The GUI and headless runs use default_session, whose environment and
+    directory are the process's own (`environ` and `cwd` are None). The
+    server gives each client a Session with private copies, so clients
+    never change os.environ or the process's directory. The core reads
+    the session in effect with session(); use_session() sets it for the
+    calling thread or asyncio task.
+    """
+
+    def __init__(self, cwd=None, environ=None):
+        self.env_vars = {}
+        self.cwd = cwd
+        self.environ = environ
+        self.job_table = JobTable()
+
+default_session = Session()
+# The default session's state, as used by the GUI.
+env_vars = default_session.env_vars
+job_table = default_session.job_table
+_current_session = ContextVar("session", default=default_session)
+
+def session():
+    return _current_session.get()
+
+def use_session(state):
+    _current_session.set(state)
+
+def current_directory():
+    cwd = session().cwd
+    return os.getcwd() if cwd is None else cwd
+
+def session_path(path):
+    """`path` as this process must open it: relative to the session's
+    directory."""
+    cwd = session().cwd
+    return path if cwd is None else os.path.join(cwd, path)
+
+def change_directory(path):
+    """cd for the current session; False if `path` is not a directory."""
+    path = session_path(path)
+    if not os.path.isdir(path):
+        return False
+    state = session()
+    if state.cwd is None:
+        os.chdir(path)
+    else:
+        state.cwd = os.path.normpath(path)
+    return True
+
+class OutputSink:
+    """Where the shell writes what a user would see.
+
+    `append(text)` adds a message from the shell itself, `write(text)`
+    streams raw command output, `error(text)` reports a diagnostic and
+    `clear()` empties the screen. The GUI passes its QTextEdit as the sink
+    for builtins; StreamSink writes to a file object for headless runs.
+    """
+
+    def append(self, text):
+        raise NotImplementedError
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def error(self, text):
+        self.append(text)
+
+    def clear(self):
+        pass
+
+class StreamSink(OutputSink):
+    """Writes output to `stream` and diagnostics to `error_stream`,
+    stdout and stderr by default."""
+
+    def __init__(self, stream=None, error_stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.error_stream = error_stream if error_stream is not None else sys.stderr
+        # Job output arrives from one reader thread per stream.
+        self._lock = threading.Lock()
+
+    def append(self, text):
+        with self._lock:
+            self.stream.write(text if text.endswith("\n") else text + "\n")
+
+    def write(self, text):
+        with self._lock:
+            self.stream.write(text)
+
+    def error(self, text):
+        with self._lock:
+            # Keeps the order of what was written to both so far.
+            self.stream.flush()
+            self.error_stream.write(text)
+            self.error_stream.flush()
+
+    def clear(self):
+        if self.stream.isatty():
+            self.write("\033[H\033[2J")
+
+def load_index():
+    """Build path_map and the command trie for the current PATH."""
+    global path_map, trie, index_wanted
+    # Imported here: scanning pulls in pickle and a thread pool.
+    from path_index import load_path_index
+    index_wanted = True
+    # Serialized so a rebuild after `export PATH` always finishes last.
+    with _index_lock:
+        started = time.perf_counter()
+        index, compiled = load_path_index(builtins)
+        with trie_lock:
+            path_map, trie = index, compiled
+        command_hash.index = path_map
+        command_hash.clear()
+        metrics.record("index", time.perf_counter() - started)
+
+def start_index_loading(on_ready=None):
+    """Load command_ranks and run load_index() on a background thread;
+    `on_ready()` is called from that thread when both are done."""
+    global index_wanted
+    index_wanted = True
+
+    def build():
+        if not command_ranks.loaded:
+            command_ranks.load()
+        load_index()
+        if on_ready is not None:
+            on_ready()
+
+    threading.Thread(target=build, name="PathIndexLoader", daemon=True).start()
+
+def is_builtin(name):
+    return name in builtins or name in ["cd", "set", "export"]
+
+def resolve_command(name):
+    """Path to run for `name`, or None for a builtin or an unknown name.
+    Every command that is found counts towards its completion rank."""
+    executable = None if is_builtin(name) else command_hash.resolve(session_path(name) if "/" in name else name)
+    if executable is not None or is_builtin(name):
+        command_ranks.use(name)
+    return executable
+
+def get_relative_path(working_directory, relative_path):
+    current_path = []
+    folders = relative_path.split("/")
+    for idx, folder in enumerate(folders):
+        if folder == ".":
+            if idx > 0:
+                return None
+            current_path.append(working_directory)
+        elif folder == "..":
+            if idx == 0:
+                current_path = working_directory.split("/")
+            current_path.pop()
+        elif folder:
+            current_path.append(folder)
+    return "/".join(current_path)
+
+def parse_arguments(command_input):
+    started = metrics.start()
+    state = session()
+    variables = state.env_vars
+    if state.environ is not None:
+        # Otherwise the lexer falls back to os.environ itself.
+        variables = ChainMap(variables, state.environ)
+    tokens = tokenize(command_input, variables)
+    metrics.stop("parse", started)
+    return tokens
+
+def parse_pipes(tokens, globber=None):
+    """Split tokens into (args, Redirections), expanding glob patterns
+    with `globber` (a GlobExpander, shared by the stages of a pipeline).
+    A pattern that matches nothing is left as it is. In the items after
+    `parallel ... :::` each pattern is an iterator of its matches, so
+    huge expansions are streamed instead of being built in memory."""
+    idx = 0
+    executions = []
+    redirects = Redirections()
+    while idx < len(tokens):
+        token = tokens[idx]
+        if token.kind == REDIRECT and is_dup(token.value):
+            redirects.add(token.value)
+            idx += 1
+        elif token.kind == REDIRECT:
+            if idx + 1 >= len(tokens) or tokens[idx + 1].kind != WORD:
+                raise ShellSyntaxError(f"syntax error near unexpected token `{token.value}'")
+            redirects.add(token.value, session_path(tokens[idx + 1].value))
+            idx += 2
+        elif token.kind == WORD:
+            if token.pattern is None:
+                executions.append(token.value)
+            else:
+                if globber is None:
+                    globber = GlobExpander(session().cwd)
+                if executions[:1] == ["parallel"] and ":::" in executions:
+                    executions.append(globber.stream(token.pattern, token.value))
+                else:
+                    executions.extend(globber.expand(token.pattern) or [token.value])
+            idx += 1
+        else:
+            raise ShellSyntaxError(f"syntax error near unexpected token `{token.value}'")
+    return executions, redirects
+
+def split_pipeline(tokens):
+    stages = [[]]
+    for token in tokens:
+        if token.kind == PIPE:
+            stages.append([])
+        else:
+            stages[-1].append(token)
+    return stages
+
+def builtin_output(args):
+    """Run a builtin as a pipeline stage, returning (stdout, stderr, status).
+    Like a subshell, state-changing builtins such as cd have no effect."""
+    if args[0] == "echo":
+        return " ".join(args[1:]) + "\n", "", 0
+    if args[0] == "pwd":
+        return current_directory() + "\n", "", 0
+    if args[0] == "type":
+        if len(args) < 2:
+            return "", "Error: Missing argument for type\n", 1
+        if args[1] in builtins:
+            return f"{args[1]} is a shell builtin\n", "", 0
+        path = command_hash.find(args[1])
+        if path is not None:
+            return f"{args[1]} is {path}\n", "", 0
+        return "", f"{args[1]}: not found\n", 1
+    if args[0] == "parallel":
+        return "", "parallel: only supported as the last stage of a pipeline\n", 2
+    if args[0] == "page":
+        return "", "page: not supported in a pipeline\n", 2
+    if is_builtin(args[0]):
+        return "", "", 0
+    return "", f"{args[0]}: command not found\n", 127
+
+def build_parallel(args, redirects, producer=None):
+    """Runner for `parallel [-j N] command [args] [::: items]`. Raises
+    ValueError with a message for bad usage."""
+    jobs = None
+    rest = args[1:]
+    while rest and rest[0].startswith("-j"):
+        value = rest[0][2:] or (rest[1] if len(rest) > 1 else "")
+        rest = rest[1:] if rest[0][2:] else rest[2:]
+        if not value.isdigit() or int(value) < 1:
+            raise ValueError(f"parallel: invalid number of jobs `{value}'")
+        jobs = int(value)
+    items = None
+    if ":::" in rest:
+        # Glob patterns among the items are iterators; see parse_pipes.
+        items = chain.from_iterable([item] if isinstance(item, str) else item
+                                    for item in rest[rest.index(":::") + 1:])
+        rest = rest[:rest.index(":::")]
+    if not rest:
+        raise ValueError("parallel: usage: parallel [-j N] command [args] [::: items]")
+    executable = command_hash.resolve(session_path(rest[0]) if "/" in rest[0] else rest[0])
+    if executable is None:
+        raise ValueError(f"parallel: {rest[0]}: command not found")
+    command_ranks.use(args[0])
+    command_ranks.use(rest[0])
+    if items is None and producer is None and redirects.stdin is None:
+        raise ValueError("parallel: no input; give items after ::: or pipe them in")
+    state = session()
+    return ParallelRunner(rest, executable, items=items, producer=producer, jobs=jobs, redirects=redirects,
+                          cwd=state.cwd, env=state.environ)
+
+def build_pipeline(tokens):
+    stages = []
+    stage_token_lists = split_pipeline(tokens)
+    globber = GlobExpander(session().cwd)
+    for stage_tokens in stage_token_lists:
+        stage_args, redirects = parse_pipes(stage_tokens, globber)
+        if not stage_args:
+            raise ShellSyntaxError("syntax error near unexpected token `|'")
+        if stage_args[0] == "parallel" and len(stages) == len(stage_token_lists) - 1:
+            # The stages before it become the producer of its input lines.
+            return build_parallel(stage_args, redirects, Pipeline(stages))
+        executable = resolve_command(stage_args[0])
+        if executable is not None:
+            stages.append(PipelineStage(
+                argv=stage_args,
+                executable=executable,
+                redirects=redirects,
+                cwd=session().cwd,
+                env=session().environ,
+            ))
+        else:
+            stages.append(PipelineStage(
+                builtin=partial(builtin_output, stage_args),
+                redirects=redirects,
+            ))
+    return Pipeline(stages)
+
+def parse_signal(name):
+    if name.isdigit():
+        return int(name)
+    name = name.upper()
+    return signal.Signals[name if name.startswith("SIG") else "SIG" + name]
+
+def kill_builtin(args, out):
+    sig = signal.SIGTERM
+    targets = args[1:]
+    try:
+        if targets[:1] == ["-s"] and len(targets) > 1:
+            sig = parse_signal(targets[1])
+            targets = targets[2:]
+        elif targets and targets[0].startswith("-") and len(targets[0]) > 1:
+            sig = parse_signal(targets[0][1:])
+            targets = targets[1:]
+    except KeyError:
+        out.error(f"kill: {targets[0]}: invalid signal specification\n")
+        session().env_vars["?"] = "1"
+        return
+    if not targets:
+        out.error("kill: usage: kill [-s sigspec | -signum] pid | jobspec ...\n")
+        session().env_vars["?"] = "2"
+        return
+    for target in targets:
+        if target.startswith("%"):
+            job = session().job_table.find(target)
+            if job is None:
+                out.error(f"kill: {target}: no such job\n")
+                session().env_vars["?"] = "1"
+                continue
+            session().job_table.send_signal(job, sig)
+        else:
+            try:
+                os.kill(int(target), sig)
+            except ValueError:
+                out.error(f"kill: {target}: arguments must be process or job IDs\n")
+                session().env_vars["?"] = "1"
+            except OSError as e:
+                out.error(f"kill: ({target}) - {e.strerror}\n")
+                session().env_vars["?"] = "1"
+
+def job_builtin(args, out):
+    """Run jobs, fg, bg, wait or kill. Returns the jobs the caller has to
+    wait for before the next command, if any."""
+    if args[0] == "jobs":
+        for job in session().job_table.listing():
+            out.write(job.describe() + "\n")
+        return None
+    if args[0] == "kill":
+        kill_builtin(args, out)
+        return None
+    if args[0] == "wait":
+        if len(args) == 1:
+            return session().job_table.running() or None
+        jobs = []
+        for spec in args[1:]:
+            job = session().job_table.find(spec)
+            if job is None:
+                out.error(f"wait: {spec}: no such job\n")
+                session().env_vars["?"] = "127"
+            elif job.state == DONE:
+                # Its exit was already signalled; take the status now.
+                session().job_table.remove(job)
+                session().env_vars["?"] = str(job.returncode)
+            else:
+                jobs.append(job)
+        return jobs or None
+    spec = args[1] if len(args) > 1 else None
+    job = session().job_table.find(spec)
+    if job is None:
+        out.error(f"{args[0]}: {spec or 'current'}: no such job\n")
+        session().env_vars["?"] = "1"
+        return None
+    session().job_table.resume(job)
+    if args[0] == "bg" and job.state != DONE:
+        out.write(f"[{job.id}] {job.command} &\n")
+        return None
+    if args[0] == "fg" and session().job_table.set_foreground(job):
+        out.write(job.command + "\n")
+        return [job]
+    session().job_table.remove(job)
+    out.write(job.describe() + "\n")
+    out.error(f"{args[0]}: job has terminated\n")
+    session().env_vars["?"] = "1"
+    return None
+
+def hash_builtin(args, out):
+    if args[1:] == ["-r"]:
+        command_hash.clear()
+        return
+    if len(args) == 1:
+        entries = command_hash.entries()
+        if not entries:
+            out.write("hash: hash table empty\n")
+            return
+        out.write("hits\tcommand\n")
+        for hits, _, path in entries:
+            out.write(f"{hits:4d}\t{path}\n")
+        return
+    for name in args[1:]:
+        if is_builtin(name):
+            continue
+        if command_hash.add(name) is None:
+            out.error(f"hash: {name}: not found\n")
+            session().env_vars["?"] = "1"
+
+class Timing:
+    """What `time` measured before the jobs it waits for were started."""
+
+    def __init__(self, started, jobs):
+        self.started = started
+        self.jobs = jobs
+
+def format_seconds(seconds):
+    return f"{int(seconds // 60)}m{seconds % 60:.3f}s"
+
+def time_report(real, user, system, maxrss_kb):
+    report = f"\nreal\t{format_seconds(real)}\nuser\t{format_seconds(user)}\nsys\t{format_seconds(system)}\n"
+    if maxrss_kb:
+        report += f"maxrss\t{maxrss_kb} KB\n"
+    return report
+
+def maxrss_kb(usage):
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS.
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+def time_command(command, sink):
+    """`time COMMAND`: builtins are reported at once from the shell's own
+    usage; for jobs the report follows once finish_jobs sees them exit."""
+    started = time.perf_counter()
+    before = resource.getrusage(resource.RUSAGE_SELF) if resource is not None else None
+    jobs = execute_command(command, sink) if command.strip() else None
+    if jobs:
+        timing = Timing(started, jobs)
+        for job in jobs:
+            job.timing = timing
+        return jobs
+    if command.rstrip().endswith("&") and not command.rstrip().endswith("&&"):
+        # Nothing to report for a job left running in the background.
+        return None
+    real = time.perf_counter() - started
+    if before is None:
+        sink.append(time_report(real, 0, 0, 0))
+        return None
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    sink.append(time_report(real, after.ru_utime - before.ru_utime,
+                            after.ru_stime - before.ru_stime, maxrss_kb(after)))
+
+def report_timing(timing, sink):
+    real = max(job.ended_at for job in timing.jobs) - timing.started
+    usage = [entry for job in timing.jobs for entry in job.runner.usage]
+    sink.append(time_report(
+        real,
+        sum(entry.ru_utime for entry in usage),
+        sum(entry.ru_stime for entry in usage),
+        max((maxrss_kb(entry) for entry in usage), default=0),
+    ))
+
+def stats_builtin(args, out):
+    """stats [on|off|reset|json|profile start|profile stop [FILE]]"""
+    action = args[1] if len(args) > 1 else ""
+    if action == "":
+        out.write(metrics.format_table())
+    elif action in ["on", "off"]:
+        metrics.enable(action == "on")
+    elif action == "reset":
+        metrics.reset()
+    elif action == "json":
+        out.write(metrics.to_json() + "\n")
+    elif action == "profile" and args[2:3] == ["start"]:
+        metrics.start_profile()
+    elif action == "profile" and args[2:3] == ["stop"]:
+        try:
+            out.write(metrics.stop_profile(session_path(args[3]) if len(args) > 3 else None))
+        except OSError as e:
+            out.error(f"stats: {args[3]}: {e.strerror}\n")
+            session().env_vars["?"] = "1"
+    else:
+        out.error("stats: usage: stats [on|off|reset|json|profile start|profile stop [FILE]]\n")
+        session().env_vars["?"] = "2"
+
+def page_builtin(args, out):
+    """page [FILE]: show FILE in the GUI's pager, which maps it rather than
+    reading it. Without a pager, or when redirected, FILE is copied to the
+    output like `cat`. Without FILE the GUI shows the last paged output."""
+    if len(args) > 2:
+        out.error("page: usage: page [FILE]\n")
+        session().env_vars["?"] = "2"
+        return
+    path = session_path(args[1]) if len(args) > 1 else None
+    if path is not None and not os.path.isfile(path):
+        out.error(f"page: {args[1]}: No such file\n")
+        session().env_vars["?"] = "1"
+        return
+    if show_pager is not None and out.stdout is None:
+        message = show_pager(path)
+        if message:
+            out.error(f"page: {message}\n")
+            session().env_vars["?"] = "1"
+        return
+    if path is None:
+        out.error("page: missing file operand\n")
+        session().env_vars["?"] = "2"
+        return
+    try:
+        if out.stdout is not None:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out.stdout)
+            return
+        with open(path, encoding="utf-8", errors="replace") as f:
+            while True:
+                lines = f.readlines(PAGE_COPY_BYTES)
+                if not lines:
+                    break
+                out.write("".join(lines))
+    except OSError as e:
+        out.error(f"page: {args[1]}: {e.strerror}\n")
+        session().env_vars["?"] = "1"
+
+def start_job(runner, command, background, sink):
+    """Start `runner` in the job table. Returns the jobs to wait for: the
+    new one if it runs in the foreground, otherwise none."""
+    try:
+        job = session().job_table.start(runner, command, not background)
+    except OSError as e:
+        report_error(sink, f"{e.filename or command}: {e.strerror}\n")
+        # 126 is for a command that was found but could not be run.
+        session().env_vars["?"] = "1" if isinstance(e, RedirectionError) else "126"
+        return None
+    if background:
+        sink.append(f"[{job.id}] {job.pid}\n")
+        return None
+    return [job]
+
+def execute_command(command, sink):
+    """Run one pipeline. Builtins run immediately and write to `sink`;
+    external commands are started in the session's job table. Returns the
+    jobs the caller must wait for, or None. Lines with `;`, `&&` or `&`
+    must be split with split_command_list first."""
+    try:
+        tokens = parse_arguments(command)
+        if tokens and tokens[0].kind == WORD and tokens[0].value == "time":
+            return time_command(command[tokens[1].start:] if len(tokens) > 1 else "", sink)
+        background = bool(tokens) and tokens[-1].kind == AMP
+        if background:
+            tokens.pop()
+            command = command[:command.rstrip().rfind("&")]
+        command = command.strip()
+        if not tokens:
+            report_error(sink, "Error: No command entered\n")
+            return
+        if any(token.kind == PIPE for token in tokens):
+            return start_job(build_pipeline(tokens), command, background, sink)
+        args, redirects = parse_pipes(tokens)
+        if args and args[0] == "parallel":
+            return start_job(build_parallel(args, redirects), command, background, sink)
+    except ShellSyntaxError as e:
+        session().env_vars["?"] = "2"
+        report_error(sink, f"Error: {e}\n")
+        return
+    except ValueError as e:
+        session().env_vars["?"] = "2"
+        report_error(sink, f"{e}\n")
+        return
+    if not args:
+        return
+    session().env_vars["?"] = "0"
+    executable = resolve_command(args[0])
+    if executable is not None:
+        return start_job(ProcessRunner(
+            args,
+            executable=executable,
+            redirects=redirects,
+            cwd=session().cwd,
+            env=session().environ,
+        ), command, background, sink)
+    try:
+        out = BuiltinOutput(redirects, sink)
+    except OSError as e:
+        report_error(sink, f"{e.filename}: {e.strerror}\n")
+        session().env_vars["?"] = "1"
+        return
+    try:
+        return run_builtin(args, out, sink)
+    finally:
+        out.close()
+
+def run_builtin(args, out, sink):
+    if args[0] == "set":
+        if len(args) >= 3:
+            session().env_vars[args[1]] = " ".join(args[2:])
+    elif args[0] == "export":
+        state = session()
+        if len(args) != 2:
+            out.error("export: usage: export NAME\n")
+            state.env_vars["?"] = "2"
+            return
+        if "=" in args[1]:
+            out.error(f"Error: Invalid variable name: {args[1]}\n")
+            state.env_vars["?"] = "1"
+            return
+        environ = os.environ if state.environ is None else state.environ
+        environ[args[1]] = state.env_vars.get(args[1], "")
+        # Commands are always looked up on the process's own PATH.
+        if args[1] == "PATH" and state.environ is None:
+            command_hash.clear()
+            if index_wanted:
+                # Until the rebuild is done, commands are found by searching PATH.
+                command_hash.index = {}
+                start_index_loading(index_rebuilt)
+    elif args[0] == "exit":
+        if len(args) == 1:
+            sys.exit(0)
+        try:
+            sys.exit(int(args[1]))
+        except ValueError:
+            out.error("Error: Invalid exit code\n")
+            session().env_vars["?"] = "1"
+    elif args[0] == "echo":
+        out.write(" ".join(args[1:]) + "\n")
+    elif args[0] == "pwd":
+        out.write(current_directory() + "\n")
+    elif args[0] == "cd":
+        if len(args) < 2:
+            out.error("Error: Missing argument for cd\n")
+            session().env_vars["?"] = "1"
+            return
+        target_dir = args[1]
+        if args[1][0] == "/":
+            if os.path.exists(args[1]):
+                full_path = args[1]
+            else:
+                out.error(f"cd: {args[1]}: No such file or directory\n")
+                session().env_vars["?"] = "1"
+                return
+        elif os.name == 'nt' and ":" in args[1]:
+            if os.path.exists(args[1]):
+                full_path = args[1]
+            else:
+                out.error(f"cd: {args[1]}: No such file or directory\n")
+                session().env_vars["?"] = "1"
+                return
+        elif "./" in args[1]:
+            relative_path = get_relative_path(current_directory(), args[1])
+            if relative_path:
+                full_path = relative_path
+            else:
+                out.error(f"cd: {args[1]}: No such file or directory\n")
+                session().env_vars["?"] = "1"
+                return
+        elif args[1] == "~":
+            full_path = os.path.expanduser("~")
+        elif args[1][0:2] == "~/":
+            relative_path = get_relative_path(os.path.expanduser("~"), args[1][2:])
+            if relative_path:
+                full_path = relative_path
+            else:
+                out.error(f"cd: {args[1]}: No such file or directory\n")
+                session().env_vars["?"] = "1"
+                return
+        else:
+            full_path = args[1]
+        if not change_directory(full_path):
+            out.error(f"cd: {args[1]}: No such file or directory\n")
+            session().env_vars["?"] = "1"
+    elif args[0] == "type":
+        if len(args) < 2:
+            out.error("Error: Missing argument for type\n")
+            session().env_vars["?"] = "1"
+            return
+        path = command_hash.find(args[1])
+        if args[1] in builtins:
+            out.write(f"{args[1]} is a shell builtin\n")
+        elif path is not None:
+            out.write(f"{args[1]} is {path}\n")
+        else:
+            out.error(f"{args[1]}: not found\n")
+            session().env_vars["?"] = "1"
+    elif args[0] == "clear":
+        sink.clear()
+    elif args[0] in ["jobs", "fg", "bg", "wait", "kill"]:
+        return job_builtin(args, out)
+    elif args[0] == "hash":
+        hash_builtin(args, out)
+    elif args[0] == "stats":
+        stats_builtin(args, out)
+    elif args[0] == "page":
+        page_builtin(args, out)
+    else:
+        out.error(f"{args[0]}: command not found\n")
+        session().env_vars["?"] = "127"
+
+def apply_path_changes(changes):
+    with trie_lock:
+        for name, target in changes.items():
+            command_hash.forget(name)
+            if target is None:
+                path_map.pop(name, None)
+                if name not in builtins:
+                    trie.remove(name)
+            else:
+                path_map[name] = target
+                trie.insert(name)
+
+def compute_suggestions(prefix):
+    """Completion suffixes for `prefix`, most used commands first and then
+    the rest shortest first; safe to call off the GUI thread."""
+    with trie_lock:
+        if trie is None:
+            return []
+        ranked = [name for name in command_ranks.top(prefix) if name in trie]
+        suggestions = [name[len(prefix):] for name in ranked]
+        rest = (suffix.word for suffix in iter_completions(prefix, trie)
+                if prefix + suffix.word not in ranked)
+        suggestions.extend(islice(rest, SUGGESTION_LIMIT - len(suggestions)))
+        return suggestions
+
+def record_job_status(job):
+    session().env_vars["?"] = str(job.returncode)
+    if isinstance(job.runner, Pipeline):
+        session().env_vars["PIPESTATUS"] = " ".join(str(status) for status in job.runner.statuses)
+
+def finish_jobs(jobs, sink):
+    """Called once every job the caller waited for has exited."""
+    record_job_status(jobs[-1])
+    reported = []
+    for job in jobs:
+        if job.timing is not None and job.timing not in reported:
+            reported.append(job.timing)
+            report_timing(job.timing, sink)
+
+def dispatch(command, sink):
+    """execute_command, timed as the "dispatch" hot path."""
+    started = metrics.start()
+    jobs = execute_command(command, sink)
+    metrics.stop("dispatch", started)
+    return jobs
+
+def exit_status():
+    try:
+        return int(session().env_vars.get("?", "0"))
+    except ValueError:
+        return 1
+
+def wait_for_jobs(jobs, sink):
+    """Block until `jobs` exit; their output reaches the job table's on_output."""
+    try:
+        session().job_table.wait(jobs)
+    except KeyboardInterrupt:
+        # Jobs run in their own session, so pass Ctrl+C on to foreground
+        # ones; background jobs only stop being waited for.
+        jobs = [job for job in jobs if job.foreground]
+        for job in jobs:
+            job.runner.interrupt()
+        session().job_table.wait(jobs)
+        if not jobs:
+            session().env_vars["?"] = "130"
+            return
+    finish_jobs(jobs, sink)
+
+def run_line(command_line, sink):
+    """Run one input line to completion and return its exit status."""
+    try:
+        commands = split_command_list(command_line)
+    except ShellSyntaxError as e:
+        report_error(sink, f"Error: {e}\n")
+        session().env_vars["?"] = "2"
+        return 2
+    for connector, source in commands:
+        if connector == AND and session().env_vars.get("?", "0") != "0":
+            continue
+        jobs = dispatch(source, sink)
+        if jobs:
+            wait_for_jobs(jobs, sink)
+    return exit_status()
+
+def run_script(lines, sink):
+    """Run each line of `lines`, skipping blank lines and `#` comments."""
+    for line in lines:
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            run_line(stripped, sink)
+    return exit_status()
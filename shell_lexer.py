@@ -0,0 +1,249 @@
+import os
+import re
+
+from glob_expand import escape
+
+WORD = "word"
+REDIRECT = "redirect"
+PIPE = "|"
+SEMI = ";"
+AND = "&&"
+AMP = "&"
+
+REDIRECT_OPERATORS = ["<", ">", "1>", "2>", ">>", "1>>", "2>>", "&>", "&>>"]
+
+# Runs of characters with no special meaning in each quoting context.
+_PLAIN = re.compile(r"[^\s'\"\\$|;&<>]+")
+_DOUBLE_QUOTED_PLAIN = re.compile(r'[^"\\$]+')
+_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_WHITESPACE = re.compile(r"\s+")
+_GLOB_CHARS = re.compile(r"[*?\[]")
+_DESCRIPTOR = re.compile(r"[0-9]+")
+
+class ShellSyntaxError(Exception):
+    pass
+
+class Token:
+    """A word or operator. A word with unquoted `*`, `?` or `[` also has
+    a `pattern` for glob_expand, in which its quoted text is escaped."""
+    __slots__ = ("kind", "value", "start", "pattern")
+
+    def __init__(self, kind, value, start, pattern=None):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.pattern = pattern
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.value!r})"
+
+def is_dup(operator):
+    """Whether a redirect duplicates another stream and takes no target word."""
+    return ">&" in operator
+
+def lookup_variable(name, variables):
+    if name in variables:
+        return variables[name]
+    return os.environ.get(name, "")
+
+def tokenize(line, variables=None, expand=True):
+    """Split `line` into Tokens in a single left-to-right pass.
+
+    `$NAME`, `${NAME}` and `$?` are expanded from `variables`, falling back
+    to os.environ, everywhere except inside single quotes. Unquoted
+    expansions are split on whitespace. Backslash escapes the next
+    character outside quotes and only \\, $ and " inside double quotes.
+    """
+    variables = variables if variables is not None else {}
+    tokens = []
+    parts = []
+    # The word as a glob pattern; only kept once it has a wildcard.
+    pattern = None
+    # A word exists once anything, even an empty quoted string, was read.
+    in_word = False
+    quoted_word = False
+    word_start = 0
+    i = 0
+    length = len(line)
+
+    def finish_word():
+        nonlocal parts, pattern, in_word, quoted_word
+        if in_word:
+            tokens.append(Token(WORD, "".join(parts), word_start,
+                                None if pattern is None else "".join(pattern)))
+        parts = []
+        pattern = None
+        in_word = False
+        quoted_word = False
+
+    def add_unquoted(text):
+        nonlocal pattern
+        if pattern is None and _GLOB_CHARS.search(text):
+            # Text read so far was quoted or has no wildcards.
+            pattern = [escape(part) for part in parts]
+        parts.append(text)
+        if pattern is not None:
+            pattern.append(text)
+
+    def add_quoted(text):
+        parts.append(text)
+        if pattern is not None:
+            pattern.append(escape(text))
+
+    def expand_variable(pos):
+        """Return (value, next position) for a `$` at `pos`."""
+        if pos + 1 < length and line[pos + 1] == "{":
+            end = line.find("}", pos + 2)
+            if end < 0:
+                raise ShellSyntaxError("bad substitution")
+            return lookup_variable(line[pos + 2:end], variables), end + 1
+        if pos + 1 < length and line[pos + 1] == "?":
+            return lookup_variable("?", variables), pos + 2
+        match = _NAME.match(line, pos + 1)
+        if match is None:
+            return "$", pos + 1
+        return lookup_variable(match.group(), variables), match.end()
+
+    while i < length:
+        ch = line[i]
+        match = _PLAIN.match(line, i)
+        if match is not None:
+            if not in_word:
+                word_start = i
+            add_unquoted(match.group())
+            in_word = True
+            i = match.end()
+        elif ch.isspace():
+            finish_word()
+            i += 1
+        elif ch == "\\":
+            if not in_word:
+                word_start = i
+            add_quoted(line[i + 1:i + 2])
+            in_word = True
+            quoted_word = True
+            i += 2
+        elif ch == "'":
+            end = line.find("'", i + 1)
+            end = length if end < 0 else end
+            if not in_word:
+                word_start = i
+            add_quoted(line[i + 1:end])
+            in_word = True
+            quoted_word = True
+            i = end + 1
+        elif ch == '"':
+            if not in_word:
+                word_start = i
+            in_word = True
+            quoted_word = True
+            i += 1
+            while i < length and line[i] != '"':
+                match = _DOUBLE_QUOTED_PLAIN.match(line, i)
+                if match is not None:
+                    add_quoted(match.group())
+                    i = match.end()
+                elif line[i] == "\\":
+                    nxt = line[i + 1:i + 2]
+                    add_quoted(nxt if nxt in ("\\", "$", '"') else "\\" + nxt)
+                    i += 2
+                elif expand:
+                    value, i = expand_variable(i)
+                    add_quoted(value)
+                else:
+                    add_quoted("$")
+                    i += 1
+            i += 1
+        elif ch == "$":
+            if not expand:
+                if not in_word:
+                    word_start = i
+                add_quoted("$")
+                in_word = True
+                i += 1
+                continue
+            start = i
+            value, i = expand_variable(i)
+            fields = _WHITESPACE.split(value)
+            if fields[0]:
+                if not in_word:
+                    word_start = start
+                add_unquoted(fields[0])
+                in_word = True
+            for field in fields[1:]:
+                finish_word()
+                if field:
+                    # Every field of the expansion starts at its `$`.
+                    word_start = start
+                    add_unquoted(field)
+                    in_word = True
+        elif ch == ">":
+            prefix = "".join(parts) if in_word and not quoted_word else ""
+            start = word_start if prefix else i
+            if prefix in ("1", "2"):
+                parts = []
+                pattern = None
+                in_word = False
+            else:
+                finish_word()
+                prefix = ""
+            operator = prefix + (">>" if line.startswith(">>", i) else ">")
+            end = i + len(operator) - len(prefix)
+            if line.startswith("&", end):
+                # `[n]>&m` duplicates descriptor m; there is no `>>&`.
+                descriptor = _DESCRIPTOR.match(line, end + 1)
+                if descriptor is None or operator.endswith(">>"):
+                    raise ShellSyntaxError("syntax error near unexpected token `&'")
+                operator += "&" + descriptor.group()
+            tokens.append(Token(REDIRECT, operator, start))
+            i += len(operator) - len(prefix)
+        elif ch == "<":
+            finish_word()
+            tokens.append(Token(REDIRECT, ch, i))
+            i += 1
+        elif ch == "|":
+            finish_word()
+            tokens.append(Token(PIPE, ch, i))
+            i += 1
+        elif ch == ";":
+            finish_word()
+            tokens.append(Token(SEMI, ch, i))
+            i += 1
+        elif line.startswith("&&", i):
+            finish_word()
+            tokens.append(Token(AND, "&&", i))
+            i += 2
+        elif line.startswith("&>", i):
+            finish_word()
+            operator = "&>>" if line.startswith("&>>", i) else "&>"
+            tokens.append(Token(REDIRECT, operator, i))
+            i += len(operator)
+        else:
+            finish_word()
+            tokens.append(Token(AMP, ch, i))
+            i += 1
+    finish_word()
+    return tokens
+
+def split_command_list(line):
+    """Split `line` on top-level `;`, `&&` and `&`.
+
+    Returns (connector, source) pairs, where connector is the operator
+    before that command (None for the first one). A command ended by `&`
+    keeps the `&` at the end of its source. Each source is lexed again
+    when it runs, so that `$?` sees the previous command's status.
+    """
+    commands = []
+    connector = None
+    start = 0
+    for token in tokenize(line, expand=False):
+        if token.kind in (SEMI, AND):
+            commands.append((connector, line[start:token.start]))
+            connector = token.kind
+            start = token.start + len(token.value)
+        elif token.kind == AMP:
+            commands.append((connector, line[start:token.start + 1]))
+            connector = AMP
+            start = token.start + 1
+    commands.append((connector, line[start:]))
+    return [(connector, source) for connector, source in commands if source.strip()]
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import threading
+from functools import partial
+
+from job_control import DONE
+from shell_core import (OutputSink, Session, use_session, dispatch, finish_jobs, exit_status, load_index,
+                        split_command_list, ShellSyntaxError, AND)
+
+SOCKET_PATH = os.path.expanduser("~/.shell_server.sock")
+# Longest request line accepted.
+REQUEST_LIMIT = 1 << 20
+# Output queued for a client before the threads producing it wait.
+SEND_BUFFER_LIMIT = 1 << 20
+
+class ClientSink(OutputSink):
+    """Sends output to one client as frames tagged with the id of the
+    request that is running."""
+
+    def __init__(self, send):
+        self.send = send
+        self.request_id = None
+
+    def _send(self, stream, text):
+        if text:
+            self.send({"id": self.request_id, "stream": stream, "data": text})
+
+    def append(self, text):
+        self._send("stdout", text if text.endswith("\n") else text + "\n")
+
+    def write(self, text):
+        self._send("stdout", text)
+
+    def error(self, text):
+        self._send("stderr", text)
+
+class ClientSession:
+    """One connection: its own Session, run one request at a time.
+
+    Requests are JSON lines: {"id": ..., "command": "..."} runs a command
+    line, optionally after changing to "cwd" and adding "env" to the
+    session's environment; {"interrupt": true} sends Ctrl+C to what is
+    running. Replies are JSON lines: {"id", "stream", "data"} frames with
+    stdout or stderr text, then {"id", "exit"} with the exit status, or
+    {"id", "error"} for a bad request. `exit` ends the session; its
+    exit frame has "closed": true. Commands are dispatched on worker
+    threads, so builtins and glob expansion never hold up other clients.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+        self.frames = asyncio.Queue()
+        self.requests = asyncio.Queue()
+        self.jobs_changed = asyncio.Event()
+        self.loop_thread = threading.get_ident()
+        # Bytes of output queued but not yet written to the client.
+        self.buffered = 0
+        self.buffer_space = threading.Condition()
+        self.closing = False
+        self.waiting = []
+        self.sink = ClientSink(self.send)
+        self.state = Session(cwd=os.getcwd(), environ=dict(os.environ))
+        self.state.job_table.on_output = self.sink.write
+        self.state.job_table.on_error = self.sink.error
+        self.state.job_table.on_exit = lambda job: self.loop.call_soon_threadsafe(self.jobs_changed.set)
+
+    def send(self, frame):
+        """Queue `frame` (None closes the connection) from any thread.
+        Everything goes through the loop's callback queue, so frames from
+        runner threads and from the loop keep the order they were sent in.
+        Threads other than the loop's wait while SEND_BUFFER_LIMIT bytes
+        of output are queued, so a client that reads slowly slows down the
+        commands writing to it instead of growing the server's memory."""
+        size = len(frame.get("data", "")) if frame is not None else 0
+        with self.buffer_space:
+            if threading.get_ident() != self.loop_thread:
+                while self.buffered >= SEND_BUFFER_LIMIT and not self.closing:
+                    self.buffer_space.wait()
+            self.buffered += size
+        self.loop.call_soon_threadsafe(self.frames.put_nowait, frame)
+
+    def stop_buffering(self):
+        """Let threads waiting in send() go on; nothing more is written."""
+        with self.buffer_space:
+            self.closing = True
+            self.buffer_space.notify_all()
+
+    async def serve(self):
+        writer = asyncio.create_task(self.write_frames())
+        self.runner = asyncio.create_task(self.run_requests())
+        try:
+            await self.read_requests()
+            await self.requests.put(None)
+            await asyncio.wait([self.runner])
+        finally:
+            self.runner.cancel()
+            # Reader threads may wait in send() holding the job table's lock.
+            self.stop_buffering()
+            self.state.job_table.terminate_all()
+            self.send(None)
+            await writer
+            self.writer.close()
+
+    def close(self):
+        """End the session, killing what it is running."""
+        self.runner.cancel()
+        self.reader.feed_eof()
+
+    async def read_requests(self):
+        while True:
+            try:
+                line = await self.reader.readline()
+            except (ValueError, ConnectionError):
+                return
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("not an object")
+            except ValueError as e:
+                self.send({"id": None, "error": f"bad request: {e}"})
+                continue
+            if request.get("interrupt"):
+                for job in self.waiting:
+                    job.runner.interrupt()
+                continue
+            await self.requests.put(request)
+
+    async def write_frames(self):
+        while True:
+            frames = [await self.frames.get()]
+            while not self.frames.empty():
+                frames.append(self.frames.get_nowait())
+            done = None in frames
+            data = "".join(json.dumps(frame) + "\n" for frame in frames if frame is not None)
+            try:
+                self.writer.write(data.encode("utf-8"))
+                await self.writer.drain()
+            except ConnectionError:
+                self.stop_buffering()
+                return
+            with self.buffer_space:
+                self.buffered -= sum(len(frame.get("data", "")) for frame in frames if frame is not None)
+                self.buffer_space.notify_all()
+            if done:
+                return
+
+    async def run_requests(self):
+        # Tasks copy the context they are created in, so this is only
+        # seen by this client's commands.
+        use_session(self.state)
+        while True:
+            request = await self.requests.get()
+            if request is None:
+                return
+            request_id = request.get("id")
+            command = request.get("command")
+            if not isinstance(command, str):
+                self.send({"id": request_id, "error": "bad request: no command"})
+                continue
+            if not self.apply_settings(request):
+                continue
+            self.sink.request_id = request_id
+            try:
+                status = await self.run_line(command)
+            except SystemExit as e:
+                self.send({"id": request_id, "exit": e.code if isinstance(e.code, int) else 0, "closed": True})
+                self.reader.feed_eof()
+                return
+            except Exception as e:
+                # Keep the session; the client gets the failure instead.
+                self.send({"id": request_id, "error": f"{type(e).__name__}: {e}"})
+            else:
+                self.send({"id": request_id, "exit": status})
+            self.sink.request_id = None
+
+    def apply_settings(self, request):
+        cwd = request.get("cwd")
+        if cwd is not None:
+            if not isinstance(cwd, str) or not os.path.isdir(cwd):
+                self.send({"id": request.get("id"), "error": f"cwd: {cwd}: not a directory"})
+                return False
+            self.state.cwd = os.path.abspath(cwd)
+        env = request.get("env")
+        if isinstance(env, dict):
+            self.state.environ.update({str(name): str(value) for name, value in env.items()})
+        return True
+
+    async def run_line(self, command_line):
+        """shell_core.run_line, waiting for jobs without blocking the loop."""
+        try:
+            commands = split_command_list(command_line)
+        except ShellSyntaxError as e:
+            self.sink.error(f"Error: {e}\n")
+            self.state.env_vars["?"] = "2"
+            return 2
+        for connector, source in commands:
+            if connector == AND and self.state.env_vars.get("?", "0") != "0":
+                continue
+            # to_thread runs it in this task's context, i.e. this session.
+            jobs = await asyncio.to_thread(dispatch, source, self.sink)
+            if jobs:
+                await self.wait(jobs)
+                finish_jobs(jobs, self.sink)
+        return exit_status()
+
+    async def wait(self, jobs):
+        self.waiting = jobs
+        try:
+            while True:
+                # Cleared before checking, so an exit in between is not lost.
+                self.jobs_changed.clear()
+                if all(job.state == DONE for job in jobs):
+                    break
+                await self.jobs_changed.wait()
+        finally:
+            self.waiting = []
+
+async def handle_client(clients, reader, writer):
+    client = ClientSession(reader, writer)
+    clients[client] = asyncio.current_task()
+    try:
+        await client.serve()
+    finally:
+        del clients[client]
+
+def claim_socket(path):
+    """Remove a socket left behind by a server that is gone; fail if one
+    is still listening."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"{path}: a server is already listening")
+
+async def serve(path=SOCKET_PATH):
+    claim_socket(path)
+    clients = {}
+    server = await asyncio.start_unix_server(partial(handle_client, clients), path=path, limit=REQUEST_LIMIT)
+    os.chmod(path, 0o600)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+            server.close()
+            for client in list(clients):
+                client.close()
+            if clients:
+                await asyncio.wait(list(clients.values()))
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+def run_server(path=SOCKET_PATH):
+    """Build the PATH index once, then serve clients until interrupted."""
+    load_index()
+    asyncio.run(serve(path))
+    return 0
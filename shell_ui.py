@@ -0,0 +1,835 @@
+import os
+import sys
+import json
+import time
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTextEdit, QVBoxLayout, QWidget, QMenuBar, QAction, QColorDialog, QFontDialog, QListWidget, QListView, QInputDialog, QDialog, QLineEdit
+from PyQt5.QtGui import QTextCursor, QFont, QTextCharFormat, QSyntaxHighlighter, QColor
+from PyQt5.QtCore import Qt, QRegularExpression, QEvent, QTimer, QStringListModel, pyqtSignal
+
+import metrics
+import shell_core
+from autocomplete_trie import common_extension, longest_common_prefix
+from scrollback import ScrollbackFile
+from pager import MappedText
+from ansi import SgrParser, PLAIN, BOLD, DIM, ITALIC, UNDERLINE, INVERSE, STRIKE, color_name
+from history_store import HistoryStore
+from dir_cache import DirectoryCache
+from job_control import DONE
+from shell_core import (env_vars, job_table, dispatch, apply_path_changes, compute_suggestions,
+                        finish_jobs, split_command_list, ShellSyntaxError, AND)
+
+dir_cache = DirectoryCache()
+SCROLLBACK_LIMIT = 10000
+OUTPUT_FLUSH_MS = 16
+HISTORY_SEARCH_LIMIT = 100
+SUGGESTION_DEBOUNCE_MS = 40
+# Characters a command may print before the rest goes to the pager.
+PAGER_THRESHOLD = 1 << 20
+THEMES = {
+    'dark': {"bg": "#1e1e1e", "fg": "#d4d4d4"},
+    'light': {"bg": "white", "fg": "black"}
+}
+# The 16 basic ANSI colors for each theme, normal then bright.
+ANSI_PALETTES = {
+    'dark': ["#000000", "#cd3131", "#0dbc79", "#e5e510", "#2472c8", "#bc3fbc", "#11a8cd", "#e5e5e5",
+             "#666666", "#f14c4c", "#23d18b", "#f5f543", "#3b8eea", "#d670d6", "#29b8db", "#ffffff"],
+    'light': ["#000000", "#cd3131", "#00bc00", "#949800", "#0451a5", "#bc05bc", "#0598bc", "#555555",
+              "#666666", "#cd3131", "#14ce14", "#b5ba00", "#0451a5", "#bc05bc", "#0598bc", "#a5a5a5"],
+}
+
+class ShellHighlighter(QSyntaxHighlighter):
+    PROMPT_BLOCK = 1
+    OUTPUT_BLOCK = 0
+    # Output lines longer than this are left unformatted.
+    MAX_HIGHLIGHT_LENGTH = 2000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.formats = {}
+        # Set while process output is inserted: it brings its own colors.
+        self.skip_output = False
+
+        # Commands (builtins)
+        command_format = QTextCharFormat()
+        command_format.setForeground(QColor("#569cd6"))  # Blue
+        keywords = ["exit", "echo", "pwd", "cd", "type", "clear"]
+        self.formats["command"] = command_format
+
+        # Paths and strings
+        string_format = QTextCharFormat()
+        string_format.setForeground(QColor("#ce9178"))  # Orange
+        self.formats["string"] = string_format
+        self.formats["path"] = string_format
+
+        # Errors
+        error_format = QTextCharFormat()
+        error_format.setForeground(QColor("#ff5555"))  # Red
+        self.formats["error"] = error_format
+
+        # One pass over the line; at any position the first alternative wins,
+        # and an error swallows the rest of the line.
+        self.expression = QRegularExpression(
+            r'(?<error>Error:.*)'
+            r'|(?<string>"[^"]*"|\'[^\']*\')'
+            r'|(?<path>[\'"]?[\/\.~][^\s\'"]*[\'"]?)'
+            r'|(?<command>\b(?:' + '|'.join(keywords) + r')\b)'
+        )
+        self.expression.optimize()
+        self.group_names = list(self.formats)
+
+    def highlightBlock(self, text):
+        started = metrics.start()
+        self.highlight(text)
+        metrics.stop("highlight", started)
+
+    def highlight(self, text):
+        # The state only depends on the block's own text, so new blocks
+        # never force earlier or later blocks to be highlighted again.
+        if not text.startswith("$ "):
+            self.setCurrentBlockState(self.OUTPUT_BLOCK)
+            if not self.skip_output and len(text) <= self.MAX_HIGHLIGHT_LENGTH:
+                index = text.find("Error:")
+                if index >= 0:
+                    self.setFormat(index, len(text) - index, self.formats["error"])
+            return
+        self.setCurrentBlockState(self.PROMPT_BLOCK)
+        matches = self.expression.globalMatch(text)
+        while matches.hasNext():
+            match = matches.next()
+            for name in self.group_names:
+                index = match.capturedStart(name)
+                if index >= 0:
+                    self.setFormat(index, match.capturedLength(name), self.formats[name])
+                    break
+
+class AnsiFormats:
+    """The QTextCharFormat for each ANSI style, made once per theme and
+    shared by every run of text in that style."""
+
+    def __init__(self, theme="dark"):
+        self.set_theme(theme)
+
+    def set_theme(self, theme, foreground=None):
+        self.palette = ANSI_PALETTES[theme]
+        self.foreground = foreground or THEMES[theme]["fg"]
+        self.background = THEMES[theme]["bg"]
+        # Plain text keeps the widget's own colors.
+        self.formats = {PLAIN: QTextCharFormat()}
+
+    def get(self, style):
+        char_format = self.formats.get(style)
+        if char_format is None:
+            char_format = self.formats[style] = self.make(style)
+        return char_format
+
+    def make(self, style):
+        foreground, background, flags = style
+        foreground = None if foreground is None else color_name(foreground, self.palette)
+        background = None if background is None else color_name(background, self.palette)
+        if flags & INVERSE:
+            foreground, background = background or self.background, foreground or self.foreground
+        char_format = QTextCharFormat()
+        if foreground is not None or flags & DIM:
+            color = QColor(foreground or self.foreground)
+            if flags & DIM:
+                color.setAlpha(160)
+            char_format.setForeground(color)
+        if background is not None:
+            char_format.setBackground(QColor(background))
+        if flags & BOLD:
+            char_format.setFontWeight(QFont.Bold)
+        char_format.setFontItalic(bool(flags & ITALIC))
+        char_format.setFontUnderline(bool(flags & UNDERLINE))
+        char_format.setFontStrikeOut(bool(flags & STRIKE))
+        return char_format
+
+class HistorySearchDialog(QDialog):
+    """Ctrl+R dialog whose result list updates on every keystroke."""
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("Search History")
+        layout = QVBoxLayout(self)
+        self.query = QLineEdit(self)
+        self.results = QListWidget(self)
+        layout.addWidget(self.query)
+        layout.addWidget(self.results)
+        self.query.textChanged.connect(self.update_results)
+        self.query.returnPressed.connect(self.accept)
+        self.results.itemActivated.connect(lambda item: self.accept())
+        self.update_results("")
+
+    def update_results(self, text):
+        self.results.clear()
+        self.results.addItems(self.history.search(text, HISTORY_SEARCH_LIMIT))
+        if self.results.count():
+            self.results.setCurrentRow(0)
+
+    def keyPressEvent(self, event):
+        # Let Up/Down move through the results while typing in the query.
+        if event.key() in [Qt.Key_Up, Qt.Key_Down]:
+            QApplication.sendEvent(self.results, event)
+            return
+        super().keyPressEvent(event)
+
+    def selected_command(self):
+        item = self.results.currentItem()
+        return item.text() if item is not None else None
+
+class ShellUI(QMainWindow):
+    # Emitted from the PATH watcher thread; Qt queues it onto the GUI thread.
+    path_changed = pyqtSignal(dict)
+    # Emitted from the index loader thread once commands can be completed.
+    index_loaded = pyqtSignal()
+    # Emitted from runner threads through job_table, for every job.
+    process_output = pyqtSignal(str)
+    job_finished = pyqtSignal(object)
+    # Emitted from the suggestion worker with (generation, suffixes).
+    suggestions_ready = pyqtSignal(int, list)
+
+    def __init__(self):
+        super().__init__()
+        self.history = HistoryStore()
+        self.history_index = -1
+        self.draft = ""
+        self.current_theme = "dark"  # Add theme tracking
+        self.suggestion_model = QStringListModel()
+        self.suggestion_list = QListView()  # Create widget
+        self.suggestion_list.setModel(self.suggestion_model)
+        self.suggestion_list.hide()  # But don't add to layout yet
+        self.suggestion_generation = 0
+        self.suggestion_worker = None
+        self.path_watcher = None
+        self.watched_map = None
+        # Jobs that must exit before the next command runs.
+        self.foreground_jobs = []
+        self.waited_jobs = []
+        self.keypress_started = None
+        self.command_queue = []
+        self.pending_output = []
+        self.ansi = SgrParser()
+        self.ansi_formats = AnsiFormats()
+        self.scrollback_limit = SCROLLBACK_LIMIT
+        self.scrollback_file = None
+        # Output of the running command, kept until it is known whether
+        # it fits in the document or goes to the pager.
+        self.command_output = []
+        self.command_output_size = 0
+        self.auto_pager = True
+        # The spill file of the last command that was paged; `paging` while
+        # its command is still writing to it.
+        self.paged_output = None
+        self.paging = False
+        self.pager = None
+        self.path_changed.connect(self.on_path_changed)
+        self.index_loaded.connect(self.on_index_loaded)
+        self.process_output.connect(self.on_process_output)
+        self.job_finished.connect(self.on_job_finished)
+        job_table.on_output = self.process_output.emit
+        job_table.on_exit = self.job_finished.emit
+        shell_core.show_pager = self.show_pager
+        shell_core.index_rebuilt = self.index_loaded.emit
+        self.suggestions_ready.connect(self.on_suggestions_ready)
+        self.initUI()
+
+    def on_path_changed(self, changes):
+        if self.watched_map is not shell_core.path_map:
+            # Queued by the watcher of an index that has been replaced.
+            return
+        apply_path_changes(changes)
+
+    def on_index_loaded(self):
+        # Deferred: the watcher pulls in ctypes and needs the index anyway.
+        from path_index import path_directories
+        from path_watcher import PathWatcher
+        if self.path_watcher is not None:
+            # The index was rebuilt for a new PATH.
+            self.path_watcher.stop()
+        self.watched_map = shell_core.path_map
+        self.path_watcher = PathWatcher(path_directories(), self.watched_map, self.path_changed.emit)
+        self.path_watcher.start()
+        if self.get_current_line():
+            # Whatever was typed while loading had no suggestions yet.
+            self.suggestion_timer.start()
+
+    def run_command(self, command_line):
+        try:
+            self.command_queue = split_command_list(command_line)
+        except ShellSyntaxError as e:
+            self.output_text.append(f"Error: {e}\n")
+            env_vars["?"] = "2"
+            self.command_queue = []
+            self.show_prompt()
+            return
+        if not self.command_queue:
+            # Reported by dispatch as an empty command.
+            self.command_queue = [(None, command_line)]
+        self.run_next_command()
+
+    def run_next_command(self):
+        while self.command_queue:
+            connector, source = self.command_queue.pop(0)
+            if connector == AND and env_vars.get("?", "0") != "0":
+                continue
+            jobs = dispatch(source, self.output_text)
+            if not jobs:
+                continue
+            # on_job_finished drops the signals of jobs already done.
+            running = [job for job in jobs if job.state != DONE]
+            if not running:
+                finish_jobs(jobs, self.output_text)
+                continue
+            self.output_text.append("")
+            self.finish_paging()
+            self.waited_jobs = jobs
+            self.foreground_jobs = running
+            return
+        self.show_prompt()
+
+    def on_process_output(self, text):
+        if self.foreground_jobs and self.auto_pager:
+            if self.paging:
+                self.paged_output.append(text)
+                return
+            self.command_output.append(text)
+            self.command_output_size += len(text)
+            if self.command_output_size > PAGER_THRESHOLD:
+                self.pending_output.append(text)
+                self.start_paging()
+                return
+        # Coalesce chunks and insert them at most once per frame.
+        self.pending_output.append(text)
+        if not self.output_timer.isActive():
+            self.output_timer.start()
+
+    def flush_output(self):
+        self.output_timer.stop()
+        if not self.pending_output:
+            return
+        started = metrics.start()
+        runs = self.ansi.feed("".join(self.pending_output))
+        self.pending_output = []
+        document = self.output_text.document()
+        above_prompt = not self.foreground_jobs and document.lastBlock().text().startswith("$ ")
+        if above_prompt:
+            # Background output while the prompt is idle goes above the
+            # prompt line, so whatever is being typed stays intact.
+            cursor = QTextCursor(document.lastBlock())
+        else:
+            cursor = self.output_text.textCursor()
+            cursor.movePosition(QTextCursor.End)
+        # One cursor and one shared format per style; the highlighter
+        # leaves the output alone.
+        self.highlighter.skip_output = True
+        try:
+            for text, style in runs:
+                cursor.insertText(text, self.ansi_formats.get(style))
+        finally:
+            self.highlighter.skip_output = False
+        if not above_prompt:
+            # Whatever is typed next starts without the output's colors.
+            cursor.setCharFormat(self.ansi_formats.get(PLAIN))
+            self.output_text.setTextCursor(cursor)
+        self.trim_scrollback()
+        metrics.stop("output", started)
+
+    def start_paging(self):
+        """Send the rest of the running command's output to a spill file
+        shown in the pager instead of the document, which keeps the start."""
+        self.flush_output()
+        self.close_pager()
+        if self.paged_output is not None:
+            self.paged_output.close()
+        self.paged_output = ScrollbackFile()
+        self.paged_output.append("".join(self.command_output))
+        self.command_output = []
+        self.paging = True
+        self.output_text.append("[output continues in the pager; `page` shows it again]")
+        self.open_pager(MappedText(file=self.paged_output.file), "output", True)
+
+    def finish_paging(self):
+        self.command_output = []
+        self.command_output_size = 0
+        if self.paging:
+            self.paging = False
+            if self.pager is not None:
+                self.pager.set_live(False)
+
+    def show_pager(self, path):
+        """shell_core.show_pager: `page [FILE]`."""
+        if path is None:
+            if self.paged_output is None:
+                return "no output has been paged yet"
+            self.open_pager(MappedText(file=self.paged_output.file), "output", self.paging)
+            return None
+        try:
+            text = MappedText(path)
+        except (OSError, ValueError) as e:
+            return f"{path}: {getattr(e, 'strerror', None) or e}"
+        self.open_pager(text, os.path.basename(path), False)
+        return None
+
+    def open_pager(self, text, title, live):
+        # Deferred: only needed once something is paged.
+        from pager_view import PagerView
+        self.close_pager()
+        self.pager = PagerView(text, title, live, self.central_widget)
+        self.pager.setFont(self.output_text.font())
+        self.pager.setStyleSheet(self.output_text.styleSheet())
+        self.pager.closed.connect(self.close_pager)
+        self.pager.interrupted.connect(self.interrupt_foreground)
+        self.layout.insertWidget(0, self.pager)
+        self.output_text.hide()
+        self.suggestion_list.hide()
+        self.pager.setFocus()
+
+    def close_pager(self):
+        if self.pager is None:
+            return
+        self.layout.removeWidget(self.pager)
+        self.pager.text.close()
+        self.pager.deleteLater()
+        self.pager = None
+        self.output_text.show()
+        self.output_text.setFocus()
+
+    def trim_scrollback(self):
+        if self.scrollback_file is None:
+            return
+        document = self.output_text.document()
+        excess = document.blockCount() - self.scrollback_limit
+        if excess <= 0:
+            return
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.Start)
+        cursor.movePosition(QTextCursor.NextBlock, QTextCursor.KeepAnchor, excess)
+        self.scrollback_file.append(cursor.selection().toPlainText())
+        cursor.removeSelectedText()
+
+    def set_scrollback(self, limit, spill):
+        self.scrollback_limit = limit
+        if spill and self.scrollback_file is None:
+            self.scrollback_file = ScrollbackFile()
+        elif not spill and self.scrollback_file is not None:
+            self.scrollback_file.close()
+            self.scrollback_file = None
+        # Without a spill file Qt evicts old blocks itself; with one, blocks
+        # are trimmed by trim_scrollback so their text can be saved first.
+        self.output_text.document().setMaximumBlockCount(0 if spill else limit)
+        self.trim_scrollback()
+
+    def on_job_finished(self, job):
+        if job not in self.foreground_jobs:
+            # Reported by show_prompt, like a shell does before its prompt.
+            return
+        self.flush_output()
+        self.foreground_jobs.remove(job)
+        if not self.foreground_jobs:
+            finish_jobs(self.waited_jobs, self.output_text)
+            self.run_next_command()
+
+    def interrupt_foreground(self):
+        """Ctrl+C: interrupt foreground jobs and stop waiting for the rest."""
+        self.foreground_jobs = [job for job in self.foreground_jobs if job.foreground]
+        for job in self.foreground_jobs:
+            job.runner.interrupt()
+        if not self.foreground_jobs:
+            env_vars["?"] = "130"
+            self.command_queue = []
+            self.show_prompt()
+
+    def show_prompt(self):
+        self.flush_output()
+        self.finish_paging()
+        # Colors left on by a command end with it.
+        self.ansi.reset()
+        self.output_text.setCurrentCharFormat(self.ansi_formats.get(PLAIN))
+        for job in job_table.pop_finished():
+            self.output_text.append(job.describe())
+        self.output_text.append("$ ")
+        self.output_text.moveCursor(QTextCursor.End)
+
+    def closeEvent(self, event):
+        job_table.terminate_all()
+        with open(os.path.expanduser("~/.shell_history"), "w") as f:
+            json.dump({
+                "theme": self.current_theme,
+                "scrollback_limit": self.scrollback_limit,
+                "scrollback_spill": self.scrollback_file is not None,
+                "auto_pager": self.auto_pager,
+            }, f)
+        if self.scrollback_file is not None:
+            self.scrollback_file.close()
+        self.close_pager()
+        if self.paged_output is not None:
+            self.paged_output.close()
+        self.history.close()
+        shell_core.command_ranks.save()
+        if self.path_watcher is not None:
+            self.path_watcher.stop()
+        if self.suggestion_worker is not None:
+            self.suggestion_worker.shutdown(wait=False)
+
+    def initUI(self):
+        self.setWindowTitle("Shell UI")
+        self.setGeometry(100, 100, 800, 600)
+
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+
+        self.layout = QVBoxLayout(self.central_widget)
+        self.output_text = QTextEdit(self)
+        self.output_text.setReadOnly(False)
+        self.output_text.setFont(QFont("Courier", 10))
+        self.output_text.setStyleSheet("background-color: #1e1e1e; color: #d4d4d4;")
+        self.layout.addWidget(self.output_text)
+        self.layout.addWidget(self.suggestion_list) 
+
+        self.output_timer = QTimer(self)
+        self.output_timer.setSingleShot(True)
+        self.output_timer.setInterval(OUTPUT_FLUSH_MS)
+        self.output_timer.timeout.connect(self.flush_output)
+        self.suggestion_timer = QTimer(self)
+        self.suggestion_timer.setSingleShot(True)
+        self.suggestion_timer.setInterval(SUGGESTION_DEBOUNCE_MS)
+        self.suggestion_timer.timeout.connect(self.show_suggestions)
+        self.set_scrollback(SCROLLBACK_LIMIT, False)
+
+        self.highlighter = ShellHighlighter(self.output_text.document())
+
+        self.output_text.append("$ ")
+        self.output_text.moveCursor(QTextCursor.End)
+
+        self.output_text.installEventFilter(self)
+
+        self.create_menu()
+        
+        if os.path.exists(os.path.expanduser("~/.shell_history")):
+            with open(os.path.expanduser("~/.shell_history"), "r") as f:
+                data = json.load(f)
+                # History used to live in this file; move it to the log once.
+                self.history.import_entries(data.get("history", []))
+                self.apply_theme(data.get("theme", "dark"))
+                self.set_scrollback(data.get("scrollback_limit", SCROLLBACK_LIMIT),
+                                    data.get("scrollback_spill", False))
+                self.spill_action.setChecked(self.scrollback_file is not None)
+                self.pager_action.setChecked(data.get("auto_pager", True))
+        self.history.start_loading()
+
+    def create_menu(self):
+        menubar = self.menuBar()
+        settings_menu = menubar.addMenu('Settings')
+
+        change_font_action = QAction('Change Font', self)
+        change_font_action.triggered.connect(self.change_font)
+        settings_menu.addAction(change_font_action)
+
+        change_color_action = QAction('Change Color', self)
+        change_color_action.triggered.connect(self.change_color)
+        settings_menu.addAction(change_color_action)
+
+        scrollback_action = QAction('Scrollback Limit', self)
+        scrollback_action.triggered.connect(self.change_scrollback_limit)
+        settings_menu.addAction(scrollback_action)
+
+        self.spill_action = QAction('Keep Evicted Output on Disk', self)
+        self.spill_action.setCheckable(True)
+        self.spill_action.toggled.connect(
+            lambda checked: self.set_scrollback(self.scrollback_limit, checked))
+        settings_menu.addAction(self.spill_action)
+
+        self.pager_action = QAction('Page Long Output', self)
+        self.pager_action.setCheckable(True)
+        self.pager_action.setChecked(self.auto_pager)
+        self.pager_action.toggled.connect(lambda checked: setattr(self, "auto_pager", checked))
+        settings_menu.addAction(self.pager_action)
+
+        search_menu = menubar.addMenu('Search')
+        search_scrollback_action = QAction('Search Scrollback', self)
+        search_scrollback_action.triggered.connect(self.show_scrollback_search)
+        search_menu.addAction(search_scrollback_action)
+
+        theme_menu = menubar.addMenu('Themes')
+        dark_action = QAction('Dark', self)
+        dark_action.triggered.connect(lambda: self.apply_theme('dark'))
+        light_action = QAction('Light', self)
+        light_action.triggered.connect(lambda: self.apply_theme('light'))
+        theme_menu.addAction(dark_action)
+        theme_menu.addAction(light_action)
+        
+    def apply_theme(self, theme):
+        self.current_theme = theme
+        self.ansi_formats.set_theme(theme)
+        self.output_text.setStyleSheet(
+            f"background-color: {THEMES[theme]['bg']}; color: {THEMES[theme]['fg']};")
+        
+    def change_font(self):
+        font, ok = QFontDialog.getFont()
+        if ok:
+            self.output_text.setFont(font)
+
+    def change_scrollback_limit(self):
+        limit, ok = QInputDialog.getInt(self, "Scrollback", "Lines to keep:",
+                                        self.scrollback_limit, 100, 10000000)
+        if ok:
+            self.set_scrollback(limit, self.scrollback_file is not None)
+
+    def change_color(self):
+        color = QColorDialog.getColor()
+        if color.isValid():
+            self.ansi_formats.set_theme('dark', color.name())
+            self.output_text.setStyleSheet(f"background-color: #1e1e1e; color: {color.name()};")
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.KeyPress:
+            key_event = event  
+            if key_event.modifiers() == Qt.ControlModifier and key_event.key() == Qt.Key_R:
+                self.show_history_search()
+                return True
+
+            if obj == self.output_text:
+                key = key_event.key()
+                cursor = self.output_text.textCursor()
+
+                # Ctrl+C interrupts the running command instead of copying
+                if self.foreground_jobs:
+                    if key_event.modifiers() == Qt.ControlModifier and key == Qt.Key_C:
+                        self.interrupt_foreground()
+                        return True
+                    if key in [Qt.Key_Return, Qt.Key_Enter]:
+                        return True
+
+                # Only edits refresh suggestions; the timer fires after the
+                # key has been applied, and restarts on every keystroke.
+                text = key_event.text()
+                if (text and text.isprintable()) or key in [Qt.Key_Backspace, Qt.Key_Delete, Qt.Key_Tab]:
+                    self.suggestion_timer.start()
+                    self.keypress_started = metrics.start()
+
+                # Handle Up/Down arrows only on last line
+                if key in [Qt.Key_Up, Qt.Key_Down]:
+                    if cursor.hasSelection():
+                        return False
+                    if cursor.blockNumber() < self.output_text.document().blockCount() - 1:
+                        return False
+                    self.handle_history_navigation(key_event)
+                    return True
+
+                # Enter key - execute command
+                elif key in [Qt.Key_Return, Qt.Key_Enter]:
+                    cursor.movePosition(QTextCursor.End)
+                    self.output_text.setTextCursor(cursor)
+                    command_line = self.output_text.document().lastBlock().text()[2:]  # Get text after "$ "
+                    self.history.add(command_line)
+                    self.history_index = -1
+                    self.suggestion_timer.stop()
+                    self.suggestion_generation += 1
+                    self.run_command(command_line)
+                    return True
+
+                # Tab key - autocomplete
+                elif key == Qt.Key_Tab:
+                    started = metrics.start()
+                    self.handle_tab_completion()
+                    metrics.stop("complete", started)
+                    return True
+
+                # Backspace - prevent deletion of prompt
+                elif key == Qt.Key_Backspace:
+                    if cursor.positionInBlock() > 2:  # Allow deletion only after "$ "
+                        return False  # Let default backspace handle it
+                    else:
+                        return True  # Block deletion of prompt
+
+
+        return super().eventFilter(obj, event)
+
+    def show_history_search(self):
+        dialog = HistorySearchDialog(self.history, self)
+        if dialog.exec_() == QDialog.Accepted:
+            command = dialog.selected_command()
+            if command is not None:
+                self.replace_current_line(command)
+
+    def show_scrollback_search(self):
+        search, ok = QInputDialog.getText(self, "Search Scrollback", "Text:")
+        if ok:
+            document = self.output_text.document()
+            matches = []
+            if self.scrollback_file is not None:
+                matches = self.scrollback_file.search(search)
+            block = document.firstBlock()
+            while block.isValid():
+                if search in block.text():
+                    matches.append(block.text())
+                block = block.next()
+            self.suggestion_generation += 1
+            self.suggestion_model.setStringList(matches)
+            if matches:
+                self.suggestion_list.show()
+
+    def show_suggestions(self):
+        """Show command suggestions under cursor"""
+        words = self.get_current_line().split()
+        prefix = words[-1] if words else ""
+        self.suggestion_generation += 1
+        generation = self.suggestion_generation
+        if self.suggestion_worker is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.suggestion_worker = ThreadPoolExecutor(max_workers=1)
+        future = self.suggestion_worker.submit(compute_suggestions, prefix)
+        future.add_done_callback(
+            lambda done: self.suggestions_ready.emit(generation, done.result()))
+
+    def on_suggestions_ready(self, generation, suggestions):
+        # Anything typed since the request makes this result stale.
+        if generation != self.suggestion_generation:
+            return
+        self.suggestion_model.setStringList(suggestions)
+        if suggestions:
+            cursor_rect = self.output_text.cursorRect()
+            self.suggestion_list.move(
+                self.output_text.mapToGlobal(cursor_rect.bottomLeft()))
+            self.suggestion_list.show()
+        else:
+            self.suggestion_list.hide()
+        # Includes the debounce delay: this is what the user waits for.
+        metrics.stop("suggest", self.keypress_started)
+        self.keypress_started = None
+
+
+    def handle_history_navigation(self, event):
+        if not self.history:
+            return
+
+        cursor = self.output_text.textCursor()
+        cursor.movePosition(QTextCursor.End)
+
+        if event.key() == Qt.Key_Up:
+            if self.history_index == -1:
+                self.draft = self.get_current_line()
+                self.history_index = len(self.history) - 1
+            elif self.history_index > 0:
+                self.history_index -= 1
+        elif event.key() == Qt.Key_Down:
+            if self.history_index < len(self.history) - 1:
+                self.history_index += 1
+            else:
+                self.history_index = -1
+
+        if self.history_index >= 0:
+            new_text = self.history[self.history_index]
+        else:
+            new_text = self.draft
+
+        self.replace_current_line(new_text)
+
+    def get_current_line(self):
+        return self.output_text.document().lastBlock().text()[2:]
+
+    def replace_current_line(self, text):
+        cursor = self.output_text.textCursor()
+        cursor.movePosition(QTextCursor.StartOfBlock)
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        cursor.insertText("$ " + text)
+        self.output_text.setTextCursor(cursor)
+
+    def handle_tab_completion(self):
+        current_line = self.get_current_line()
+        buf_words = current_line.split()
+        if not buf_words:
+            return
+
+        current_word = buf_words[-1]
+        if any(current_word.startswith(prefix) for prefix in ('/', './', '../', '~/', '~')):
+            self.handle_path_completion(current_word, buf_words, current_line)
+        else:
+            self.handle_command_completion(current_word, buf_words, current_line)
+
+    def handle_path_completion(self, current_word, buf_words, current_line):
+        expanded_word = os.path.expanduser(current_word)
+        dirname, partial = os.path.split(expanded_word)
+        dirname = dirname or '.'
+        listing = dir_cache.get(dirname)
+        if listing is None:
+            return
+
+        matches = listing.complete(partial)
+        if not matches:
+            return
+
+        notes = []
+        if len(matches) == 1:
+            name, is_dir = matches[0]
+            completion = name[len(partial):]
+            if is_dir:
+                completion += '/'
+                full_path = os.path.join(dirname, name)
+                try:
+                    preview_items, more = dir_cache.preview(full_path)
+                    preview = ", ".join(preview_items)
+                    if more:
+                        preview += "..."
+                    notes.append(f"  Contents: {preview}")
+                except OSError as e:
+                    notes.append(f"  Preview error: {str(e)}")
+                # The next Tab will most likely complete inside it.
+                dir_cache.prefetch(full_path)
+            buf_words[-1] = current_word + completion
+        else:
+            names = [name for name, _ in matches]
+            common_prefix = longest_common_prefix(names)[len(partial):]
+            if common_prefix:
+                buf_words[-1] = current_word + common_prefix
+            else:
+                notes.append(" ".join(names))
+
+        new_line = ' '.join(buf_words)
+        if notes:
+            # Print below the prompt, then start a fresh prompt line.
+            for note in notes:
+                self.output_text.append(note)
+            self.output_text.append("$ " + new_line)
+            self.output_text.moveCursor(QTextCursor.End)
+        else:
+            self.output_text.textCursor().insertText(new_line[len(current_line):])
+
+    def handle_command_completion(self, current_word, buf_words, current_line):
+        if shell_core.trie is None:
+            # The index is still loading; Tab works again once it is ready.
+            return
+        extension = common_extension(current_word, shell_core.trie)
+        if extension is None:
+            return
+        if extension:
+            buf_words[-1] += extension
+        elif current_word not in shell_core.trie:
+            # Ambiguous: take the command used most often and most lately.
+            ranked = [name for name in shell_core.command_ranks.top(current_word) if name in shell_core.trie]
+            if not ranked:
+                return
+            buf_words[-1] = ranked[0]
+        new_line = " ".join(buf_words)
+        self.output_text.textCursor().insertText(new_line[len(current_line):])
+
+
+def report_startup(launched):
+    elapsed = time.perf_counter() - launched
+    metrics.record("startup", elapsed)
+    if metrics.enabled:
+        sys.stderr.write(f"first prompt after {elapsed * 1000:.1f} ms\n")
+
+def run_gui(argv, launched=None):
+    """Show the window right away; the PATH index is built in the
+    background and commands are looked up on PATH until it is ready."""
+    if launched is None:
+        launched = time.perf_counter()
+    app = QApplication(argv)
+    shell_ui = ShellUI()
+    shell_ui.show()
+    # Runs on the first pass of the event loop, once the prompt is painted.
+    QTimer.singleShot(0, lambda: report_startup(launched))
+    shell_core.start_index_loading(shell_ui.index_loaded.emit)
+    return app.exec_()
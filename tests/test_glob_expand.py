@@ -0,0 +1,57 @@
+import pytest
+
+from glob_expand import GlobExpander, compile_segment, escape
+
+@pytest.fixture
+def tree(tmp_path):
+    for path in ["a.txt", "b.txt", "c.log", ".hidden.txt", "[z-a]", "sub/d.txt", "sub/deep/e.txt", "sub/.dot/f.txt"]:
+        target = tmp_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text("")
+    return GlobExpander(str(tmp_path))
+
+@pytest.mark.parametrize("segment, name, matches", [
+    ("*.txt", "a.txt", True),
+    ("*.txt", "a.log", False),
+    ("?.txt", "ab.txt", False),
+    ("[ab].txt", "b.txt", True),
+    ("[!ab].txt", "b.txt", False),
+    ("[^ab].txt", "c.txt", True),
+    ("[]a]", "]", True),
+    ("\\*", "*", True),
+    ("\\*", "a", False),
+])
+def test_compile_segment(segment, name, matches):
+    assert (compile_segment(segment).fullmatch(name) is not None) == matches
+
+def test_invalid_range_is_literal():
+    assert compile_segment("[z-a]").fullmatch("[z-a]") is not None
+    assert compile_segment("[z-a]*").fullmatch("[z-a]x") is not None
+
+def test_unclosed_bracket_is_literal():
+    assert compile_segment("[ab").fullmatch("[ab") is not None
+
+def test_escape():
+    assert compile_segment(escape("a*[b]?")).fullmatch("a*[b]?") is not None
+
+def test_expand_sorted_without_hidden(tree):
+    assert tree.expand("*.txt") == ["a.txt", "b.txt"]
+    assert tree.expand(".*.txt") == [".hidden.txt"]
+
+def test_expand_subdirectories(tree):
+    assert tree.expand("sub/*.txt") == ["sub/d.txt"]
+    assert tree.expand("*/*.txt") == ["sub/d.txt"]
+
+def test_double_star(tree):
+    assert tree.expand("**/*.txt") == ["a.txt", "b.txt", "sub/d.txt", "sub/deep/e.txt"]
+
+def test_no_match(tree):
+    assert tree.expand("*.png") == []
+    assert list(tree.stream("*.png", "*.png")) == ["*.png"]
+
+def test_invalid_range_matches_literal_name(tree):
+    assert tree.expand("[z-a]") == ["[z-a]"]
+
+def test_limit(tree):
+    with pytest.raises(ValueError):
+        tree.expand("*", limit=2)
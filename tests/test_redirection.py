@@ -0,0 +1,96 @@
+import pytest
+
+from redirection import Redirections, BuiltinOutput, RedirectionError, STDOUT, STDERR
+
+class ListSink:
+    def __init__(self):
+        self.out = []
+        self.err = []
+
+    def append(self, text):
+        self.out.append(text)
+
+    def error(self, text):
+        self.err.append(text)
+
+def redirects(*pairs):
+    result = Redirections()
+    for operator, *target in pairs:
+        result.add(operator, *target)
+    return result
+
+def test_stdout_and_stderr_targets(tmp_path):
+    result = redirects((">", str(tmp_path / "o")), ("2>>", str(tmp_path / "e")))
+    assert result.stdout.filepath == str(tmp_path / "o")
+    assert result.stdout.write_strategy == "w"
+    assert result.stderr.write_strategy == "a"
+
+def test_stderr_to_stdout_file_shares_it(tmp_path):
+    result = redirects((">", str(tmp_path / "o")), ("2>&1",))
+    assert result.stderr is result.stdout
+
+def test_stderr_to_undirected_stdout():
+    assert redirects(("2>&1",)).stderr == STDOUT
+
+@pytest.mark.parametrize("operator", [">&2", "1>&2"])
+def test_stdout_to_undirected_stderr(operator):
+    assert redirects((operator,)).stdout == STDERR
+
+def test_stdout_to_stderr_file_shares_it(tmp_path):
+    result = redirects(("2>", str(tmp_path / "e")), (">&2",))
+    assert result.stdout is result.stderr
+
+def test_swapping_back_restores_the_display():
+    assert redirects((">&2",), ("2>&1",)).stderr is None
+    assert redirects(("2>&1",), (">&2",)).stdout is None
+
+def test_order_matters(tmp_path):
+    # `2>&1 >file` leaves stderr where stdout was.
+    result = redirects(("2>&1",), (">", str(tmp_path / "o")))
+    assert result.stderr is None
+    assert result.stdout is not None
+
+def test_both_streams(tmp_path):
+    result = redirects(("&>", str(tmp_path / "o")))
+    assert result.stdout is result.stderr
+
+def test_dup_to_itself_does_nothing():
+    result = redirects((">&1",), ("2>&2",))
+    assert result.stdout is None and result.stderr is None
+
+def test_bad_descriptor():
+    with pytest.raises(ValueError):
+        redirects((">&3",))
+
+def test_missing_input(tmp_path):
+    with pytest.raises(RedirectionError):
+        redirects(("<", str(tmp_path / "missing"))).open()
+
+def test_missing_directory_is_not_created(tmp_path):
+    with pytest.raises(RedirectionError):
+        redirects((">", str(tmp_path / "no" / "f"))).open()
+    assert not (tmp_path / "no").exists()
+
+def test_builtin_output_writes_files_on_close(tmp_path):
+    sink = ListSink()
+    out = BuiltinOutput(redirects((">", str(tmp_path / "o")), ("2>&1",)), sink)
+    out.write("a\n")
+    out.error("b\n")
+    out.close()
+    assert (tmp_path / "o").read_text() == "a\nb\n"
+    assert sink.out == [] and sink.err == []
+
+def test_builtin_output_to_sink():
+    sink = ListSink()
+    out = BuiltinOutput(Redirections(), sink)
+    out.write("a\n")
+    out.error("b\n")
+    out.close()
+    assert sink.out == ["a\n"] and sink.err == ["b\n"]
+
+def test_builtin_output_to_stderr():
+    sink = ListSink()
+    out = BuiltinOutput(redirects((">&2",)), sink)
+    out.write("a\n")
+    out.close()
+    assert sink.out == [] and sink.err == ["a\n"]
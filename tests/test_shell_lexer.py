@@ -0,0 +1,62 @@
+import pytest
+
+from shell_lexer import tokenize, split_command_list, ShellSyntaxError, WORD, REDIRECT, PIPE, AMP
+
+def kinds(line, variables=None):
+    return [(token.kind, token.value) for token in tokenize(line, variables)]
+
+def test_words_and_quotes():
+    assert kinds("echo 'a b' \"c d\" e\\ f") == [(WORD, "echo"), (WORD, "a b"), (WORD, "c d"), (WORD, "e f")]
+
+def test_empty_quoted_word():
+    assert kinds("echo ''") == [(WORD, "echo"), (WORD, "")]
+
+def test_variables():
+    variables = {"X": "one two", "?": "3"}
+    assert kinds("echo $X \"$X\" ${X}x $?", variables) == [
+        (WORD, "echo"), (WORD, "one"), (WORD, "two"), (WORD, "one two"), (WORD, "one"), (WORD, "twox"), (WORD, "3")]
+
+def test_single_quotes_do_not_expand():
+    assert kinds("echo '$X'", {"X": "x"}) == [(WORD, "echo"), (WORD, "$X")]
+
+def test_bad_substitution():
+    with pytest.raises(ShellSyntaxError):
+        tokenize("echo ${X")
+
+def test_operators():
+    assert kinds("a | b > out 2>> err < in &") == [
+        (WORD, "a"), (PIPE, "|"), (WORD, "b"), (REDIRECT, ">"), (WORD, "out"), (REDIRECT, "2>>"), (WORD, "err"),
+        (REDIRECT, "<"), (WORD, "in"), (AMP, "&")]
+
+def test_quoted_digit_is_not_a_descriptor():
+    assert kinds("echo '2'>out") == [(WORD, "echo"), (WORD, "2"), (REDIRECT, ">"), (WORD, "out")]
+
+@pytest.mark.parametrize("line, operator", [
+    ("cmd 2>&1", "2>&1"), ("cmd >&2", ">&2"), ("cmd 1>&2", "1>&2"), ("cmd >&1", ">&1")])
+def test_dup_operators(line, operator):
+    assert kinds(line) == [(WORD, "cmd"), (REDIRECT, operator)]
+
+@pytest.mark.parametrize("line", ["echo a >&", "echo a >&x", "echo a >>&1"])
+def test_bad_dup_operators(line):
+    with pytest.raises(ShellSyntaxError):
+        tokenize(line)
+
+def test_glob_pattern_escapes_quoted_text():
+    word = tokenize("'*'*")[0]
+    assert word.value == "**"
+    assert word.pattern == "\\**"
+    assert tokenize("'*'")[0].pattern is None
+
+def test_word_starts():
+    tokens = tokenize("echo  'a b' >out")
+    assert [token.start for token in tokens] == [0, 6, 12, 13]
+
+def test_expansion_starts_at_its_dollar():
+    tokens = tokenize("time $X hi", {"X": "echo a"})
+    assert [(token.value, token.start) for token in tokens] == [("time", 0), ("echo", 5), ("a", 5), ("hi", 8)]
+
+def test_split_command_list():
+    assert split_command_list("a; b && c & d") == [(None, "a"), (";", " b "), ("&&", " c &"), ("&", " d")]
+
+def test_split_command_list_keeps_quoted_operators():
+    assert split_command_list("echo ';' && echo $?") == [(None, "echo ';' "), ("&&", " echo $?")]